@@ -0,0 +1,89 @@
+"""
+Correctness check and lookup timing for the answer cache
+(streamlit_app/answer_cache.py).
+
+Negative pairs are questions whose stored answer must NOT be returned for the
+other question, however similar the text: a different month, tax type,
+requested action, a negated verb, or an extra question. Positive pairs only
+differ in casing, punctuation, greetings or question particles and must hit.
+Every pair is checked in both directions against a fresh cache.
+
+Then lookup latency (ms) with --entries similar questions stored.
+
+Usage:
+    python benchmarks/answer_cache.py [--entries 1000] [--number 200]
+
+Exits with status 1 when any pair is answered wrongly. Needs streamlit
+importable (the module is imported, no app is started).
+"""
+import argparse
+import os
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
+import answer_cache  # noqa: E402
+
+KDV_CORRECTION = (
+    "Merhaba, Ocak 2024 döneminde bazı faturalarımızda KDV oranını yanlışlıkla yüzde 20 yerine yüzde 10 "
+    "uyguladığımızı fark ettik. Bu nedenle beyannamenin düzeltilmesini talep ediyoruz."
+)
+KDV_AUDIT = (
+    "İç denetimde, 2024/Ocak dönemine ait bazı hizmet faturalarında KDV oranının hatalı uygulandığı tespit "
+    "edilmiştir. Sorunun çözümü için referans alınması gereken mevzuatlar nelerdir?"
+)
+
+NEGATIVE_PAIRS = [
+    (KDV_CORRECTION, KDV_CORRECTION.replace("Ocak", "Şubat")),
+    (KDV_CORRECTION, KDV_CORRECTION.replace("KDV", "ÖTV")),
+    (KDV_CORRECTION, KDV_CORRECTION.replace("düzeltilmesini", "iptalini")),
+    (KDV_AUDIT, KDV_AUDIT.replace("KDV", "stopaj")),
+    ("Kira geliri nasıl vergilendirilir?", "Kira geliri nasıl vergilendirilmez?"),
+    ("Kurumlar vergisi oranı nedir?", "Kurumlar vergisi oranı nedir? Emlak vergisi oranı nedir?"),
+    ("Serbest meslek kazancı beyan edilir mi?", "Serbest meslek kazancı beyan edilmez mi?"),
+    ("Ücret geliri gelir vergisine tabi midir?", "Ücret geliri gelir vergisine tabi değil midir?"),
+]
+
+POSITIVE_PAIRS = [
+    ("Gelirin unsurları nelerdir?", "gelirin unsurları nelerdir"),
+    ("Gelirin unsurları nelerdir?", "Merhaba, gelirin unsurları nedir acaba?"),
+    ("Kurumlar vergisi oranı nedir?", "Lütfen kurumlar vergisi oranı nedir"),
+    (KDV_CORRECTION, KDV_CORRECTION.replace("Merhaba, ", "")),
+]
+
+def check() -> list:
+    failures = []
+    for expect_hit, pairs in ((False, NEGATIVE_PAIRS), (True, POSITIVE_PAIRS)):
+        for a, b in pairs:
+            for stored, asked in ((a, b), (b, a)):
+                cache = answer_cache.AnswerCache()
+                cache.store(stored, "answer")
+                hit = cache.lookup(asked)
+                if (hit is not None) != expect_hit:
+                    got = f"hit at {hit[1]:.2f}" if hit else "miss"
+                    failures.append(f"expected {'hit' if expect_hit else 'miss'}, got {got}:\n"
+                                    f"  stored: {stored[:90]}\n  asked:  {asked[:90]}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    failures = check()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"pairs: {2 * (len(NEGATIVE_PAIRS) + len(POSITIVE_PAIRS)) - len(failures)} OK, {len(failures)} failed")
+
+    cache = answer_cache.AnswerCache(max_items=args.entries)
+    for i in range(args.entries):
+        cache.store(f"{KDV_AUDIT} Dosya {i}.", "answer")
+    for name, question in (("miss", "Kira geliri nasıl vergilendirilir?"), ("exact", f"{KDV_AUDIT} Dosya 7.")):
+        seconds = timeit.timeit(lambda: cache.lookup(question), number=args.number) / args.number
+        print(f"lookup {name:<6} {args.entries} entries: {seconds * 1000:.3f} ms")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
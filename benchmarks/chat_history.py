@@ -0,0 +1,97 @@
+"""
+Per-session chat history (streamlit_app/chat_history.py) over a long
+conversation, against the previous unbounded message list that re-rendered
+every message on every rerun.
+
+For each conversation length: memory held by the history (tracemalloc),
+Streamlit elements emitted by one rerun and the time to emit them. Streamlit
+calls go to a recorder that only counts them, so the time is the app's own
+per-rerun work, not the browser's.
+
+Usage:
+    python benchmarks/chat_history.py [--turns 10,100,1000] [--answer-chars 2000]
+
+Needs streamlit importable (the module is imported, no app is started).
+"""
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
+import chat_history  # noqa: E402
+
+from load import text_of_length  # noqa: E402
+
+class RecordingStreamlit:
+    """Counts the st.* calls chat_history makes; containers are no-op context managers."""
+
+    def __init__(self):
+        self.elements = 0
+
+    def _element(self, *args, **kwargs):
+        self.elements += 1
+        return contextlib.nullcontext()
+
+    markdown = caption = audio = chat_message = expander = _element
+
+    def number_input(self, label, min_value, max_value, value, **kwargs):
+        self.elements += 1
+        return value
+
+class FakeTTSCache:
+    def answer_ref(self, keys, expires_in):
+        return b"".join(bytes.fromhex(key) for key in keys)
+
+def render_unbounded(messages: list, st) -> None:
+    """The previous home_page loop."""
+    for message in messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+def conversation(turns: int, answer_chars: int):
+    for i in range(turns):
+        yield "user", f"{i}. soru: gelir vergisi beyannamesi ne zaman verilir?", ()
+        yield "assistant", text_of_length(answer_chars, salt=f"{i}. "), [f"{i:040x}", f"{i + 1:040x}"]
+
+def measure(turns: int, answer_chars: int, bounded: bool) -> dict:
+    st = RecordingStreamlit()
+    chat_history.st = st
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    if bounded:
+        store = chat_history.ChatHistory()
+        for role, content, audio in conversation(turns, answer_chars):
+            store.append(role, content, audio)
+    else:
+        store = [{"role": role, "content": content} for role, content, _ in conversation(turns, answer_chars)]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    if bounded:
+        chat_history.render(store, FakeTTSCache())
+    else:
+        render_unbounded(store, st)
+    return {"mb": (held - before) / (1024 * 1024), "elements": st.elements,
+            "ms": (time.perf_counter() - t0) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="10,100,1000")
+    parser.add_argument("--answer-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'store':<10} {'held MB':>8} {'elements':>9} {'render ms':>10}")
+    for turns in (int(v) for v in args.turns.split(",")):
+        for name, bounded in (("unbounded", False), ("bounded", True)):
+            r = measure(turns, args.answer_chars, bounded)
+            print(f"{turns:>6} {name:<10} {r['mb']:>8.2f} {r['elements']:>9} {r['ms']:>10.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
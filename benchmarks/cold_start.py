@@ -0,0 +1,76 @@
+"""
+Cold-start benchmark for image_lambda.
+
+Each sample runs in a fresh interpreter and measures:
+  import        -> `import image_lambda`
+  first_text    -> first lambda_handler call with a text-only event
+  first_clients -> creating the s3 / bedrock-runtime / transcribe clients
+
+Usage:
+    python benchmarks/cold_start.py [--runs 10] [--baseline <git-ref>]
+
+With --baseline, image_lambda.py from that ref is measured as well, so the
+output shows before/after side by side. Needs boto3; no AWS calls are made.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import image_lambda
+t1 = time.perf_counter()
+image_lambda.lambda_handler({"user_input": "Gelirin unsurları nelerdir?"}, None)
+t2 = time.perf_counter()
+for service in ("s3", "bedrock-runtime", "transcribe"):
+    if hasattr(image_lambda, "get_client"):
+        image_lambda.get_client(service)
+    else:
+        {"s3": image_lambda.s3, "bedrock-runtime": image_lambda.bedrock, "transcribe": image_lambda.transcribe}[service]
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_text": t2 - t1, "first_clients": t3 - t2}))
+"""
+
+def _sample(module_dir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    env["PYTHONPATH"] = module_dir + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.run([sys.executable, "-c", _PROBE], env=env, cwd=module_dir,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure(module_dir: str, runs: int) -> dict:
+    samples = [_sample(module_dir) for _ in range(runs)]
+    return {k: statistics.median(s[k] for s in samples) * 1000 for k in samples[0]}
+
+def _checkout(ref: str, dest: str) -> str:
+    source = subprocess.run(["git", "show", f"{ref}:image_lambda.py"], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    with open(os.path.join(dest, "image_lambda.py"), "w", encoding="utf-8") as f:
+        f.write(source)
+    return dest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--baseline", help="git ref to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    results = {"current": measure(REPO_ROOT, args.runs)}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            results[args.baseline] = measure(_checkout(args.baseline, tmp), args.runs)
+
+    print(f"{'median ms':<14}" + "".join(f"{name:>16}" for name in results))
+    for metric in results["current"]:
+        print(f"{metric:<14}" + "".join(f"{r[metric]:>16.1f}" for r in results.values()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Micro-benchmark for image_lambda._extract_inputs over the known event shapes:
+Flow 'data' object, node.inputs 'data' JSON string, node.inputs single fields,
+S3 Records, Lambda console test, and a Flow event with large inlined data.
+
+Usage:
+    python benchmarks/extract_inputs.py [--number 20000] [--baseline <git-ref>]
+
+With --baseline, _extract_inputs from image_lambda.py at that ref is timed
+side by side. Needs boto3 importable; no AWS calls are made.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import tempfile
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FLOW_DATA = {"user_input": "Gelirin unsurları nelerdir?", "image_path": ["s3://gelir-vergisi/images/a.png"],
+              "audio_path": [], "mediaType": "image/png"}
+
+EVENT_SHAPES = {
+    "flow_data": {"data": dict(_FLOW_DATA)},
+    "node_data_json": {"node": {"inputs": [{"name": "data", "value": json.dumps(_FLOW_DATA)}]}},
+    "node_single": {"node": {"inputs": [
+        {"name": "user_input", "value": "Gelirin unsurları nelerdir?"},
+        {"name": "image_path", "value": "s3://gelir-vergisi/images/a.png"},
+        {"name": "mediaType", "value": "image/png"},
+    ]}},
+    "s3_records": {"Records": [
+        {"s3": {"bucket": {"name": "gelir-vergisi"}, "object": {"key": f"images/receipt+{i}.jpg"}}}
+        for i in range(20)
+    ]},
+    "console_test": {"user_input": "test", "image_path": "", "audio_path": "", "answer_model": "claude-sonnet-4"},
+    "node_data_large": {"node": {"inputs": [{"name": "data", "value": json.dumps(
+        dict(_FLOW_DATA, context="x" * 200_000, image_path=[f"s3://gelir-vergisi/images/{i}.png" for i in range(50)])
+    )}]}},
+}
+
+def _load(path: str, name: str):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _baseline_module(ref: str, tmp: str):
+    source = subprocess.run(["git", "show", f"{ref}:image_lambda.py"], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    path = os.path.join(tmp, "image_lambda_baseline.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    return _load(path, "image_lambda_baseline")
+
+def time_shapes(extract, number: int) -> dict:
+    """Microseconds per call, best of 5 repeats."""
+    return {name: min(timeit.repeat(lambda: extract(event), number=number, repeat=5)) / number * 1e6
+            for name, event in EVENT_SHAPES.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--baseline", help="git ref to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    current = _load(os.path.join(REPO_ROOT, "image_lambda.py"), "image_lambda")
+    results = {"current": time_shapes(current._extract_inputs, args.number)}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.baseline:
+            baseline = _baseline_module(args.baseline, tmp)
+            results[args.baseline] = time_shapes(baseline._extract_inputs, args.number)
+
+    print(f"{'us/call':<18}" + "".join(f"{name:>14}" for name in results))
+    for shape in EVENT_SHAPES:
+        print(f"{shape:<18}" + "".join(f"{r[shape]:>14.2f}" for r in results.values()))
+    print()
+    for shape, event in EVENT_SHAPES.items():
+        parsed = current.parse_event_inputs(event)
+        print(f"{shape:<18} sources={parsed['sources']} warnings={len(parsed['warnings'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+In-process stand-ins for the AWS clients used by image_lambda and the
+Streamlit config module, for offline benchmarks.
+
+Every fake takes a Faults object: per-call latency (seconds, with optional
+jitter), a random throttle rate and/or a quota in calls per second. A
+throttled call raises the same botocore ClientError ("ThrottlingException")
+a real client raises once its own retries are exhausted.
+"""
+import functools
+import hashlib
+import http.server
+import io
+import json
+import random
+import threading
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+class Faults:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 quota_per_sec: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.quota_per_sec = quota_per_sec
+        self._quota_tokens = quota_per_sec
+        self._quota_last = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+
+    def apply(self, operation: str) -> None:
+        """Sleep for the injected latency, then maybe raise ThrottlingException."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+            throttle = self.throttle_rate and self._random.random() < self.throttle_rate
+            if self.quota_per_sec:
+                # Server-side token bucket, one second of burst
+                now = time.monotonic()
+                self._quota_tokens = min(self.quota_per_sec,
+                                         self._quota_tokens + (now - self._quota_last) * self.quota_per_sec)
+                self._quota_last = now
+                if self._quota_tokens >= 1:
+                    self._quota_tokens -= 1
+                else:
+                    throttle = True
+            if throttle:
+                self.throttled += 1
+        if delay > 0:
+            time.sleep(delay)
+        if throttle:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"},
+                               "ResponseMetadata": {"HTTPStatusCode": 400}}, operation)
+
+class FakeS3:
+    def __init__(self, faults: Faults = None):
+        self.faults = faults or Faults()
+        self.objects = {}  # (bucket, key) -> (bytes, etag)
+
+    def put(self, bucket: str, key: str, data: bytes) -> str:
+        self.objects[(bucket, key)] = (data, hashlib.md5(data).hexdigest())
+        return f"s3://{bucket}/{key}"
+
+    def _get(self, bucket: str, key: str, operation: str):
+        self.faults.apply(operation)
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": key},
+                               "ResponseMetadata": {"HTTPStatusCode": 404}}, operation)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        data, etag = self._get(Bucket, Key, "HeadObject")
+        return {"ETag": f'"{etag}"', "ContentLength": len(data)}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        data, etag = self._get(Bucket, Key, "GetObject")
+        return {"Body": io.BytesIO(data), "ETag": f'"{etag}"', "ContentLength": len(data)}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000, **kwargs):
+        self.faults.apply("ListObjectsV2")
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        out = {"Contents": [{"Key": k, "ETag": f'"{self.objects[(Bucket, k)][1]}"',
+                             "Size": len(self.objects[(Bucket, k)][0])} for k in page],
+               "IsTruncated": start + MaxKeys < len(keys)}
+        if out["IsTruncated"]:
+            out["NextContinuationToken"] = str(start + MaxKeys)
+        return out
+
+    def get_paginator(self, operation: str):
+        assert operation == "list_objects_v2", operation
+        s3 = self
+
+        class _Paginator:
+            def paginate(self, **kwargs):
+                token = None
+                while True:
+                    page = s3.list_objects_v2(ContinuationToken=token, **kwargs)
+                    yield page
+                    if not page["IsTruncated"]:
+                        return
+                    token = page["NextContinuationToken"]
+        return _Paginator()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.faults.apply("PutObject")
+        self.put(Bucket, Key, Body if isinstance(Body, bytes) else Body.read())
+        return {}
+
+class FakeBedrock:
+    """Answers with one short analysis per image block found in the request body."""
+
+    def __init__(self, faults: Faults = None, per_image_sec: float = 0.0):
+        self.faults = faults or Faults()
+        self.per_image_sec = per_image_sec
+        self.request_bytes = 0
+
+    def _answer(self, body) -> str:
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.request_bytes = len(body)
+        images = body.count(b'"type": "image"')
+        if self.per_image_sec:
+            time.sleep(self.per_image_sec * images)
+        if images <= 1:
+            return "Fatura: 1.250,00 TL, KDV %20."
+        return "\n".join(f"## image_{i}\nFatura {i}: 1.250,00 TL." for i in range(1, images + 1))
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self.faults.apply("InvokeModel")
+        text = self._answer(body)
+        return {"body": io.BytesIO(json.dumps({"content": [{"type": "text", "text": text}]}).encode())}
+
+class _TranscriptServer:
+    """Keep-alive HTTP server on 127.0.0.1 serving transcripts from a dict (started on first use)."""
+
+    def __init__(self):
+        self.documents = {}
+        self.requests = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                body = server.documents.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                body = body or b"{}"
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def publish(self, name: str, body: bytes) -> str:
+        path = f"/transcripts/{name}.json"
+        self.documents[path] = body
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+class FakeTranscribe:
+    """
+    Jobs complete job_sec after they are started; job names are unique, as in the
+    real service (ConflictException). Transcripts are served by a local
+    keep-alive HTTP server, like the presigned TranscriptFileUri.
+    """
+
+    def __init__(self, faults: Faults = None, job_sec: float = 0.2):
+        self.faults = faults or Faults()
+        self.job_sec = job_sec
+        self.jobs = {}
+        self.started = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start_transcription_job(self, TranscriptionJobName, Media, **kwargs):
+        self.faults.apply("StartTranscriptionJob")
+        with self._lock:
+            if TranscriptionJobName in self.jobs:
+                raise ClientError({"Error": {"Code": "ConflictException",
+                                             "Message": "The requested job name already exists."},
+                                   "ResponseMetadata": {"HTTPStatusCode": 400}}, "StartTranscriptionJob")
+            self.jobs[TranscriptionJobName] = (time.time() + self.job_sec, Media["MediaFileUri"])
+            self.started += 1
+        return {"TranscriptionJob": {"TranscriptionJobName": TranscriptionJobName,
+                                     "TranscriptionJobStatus": "IN_PROGRESS"}}
+
+    def get_transcription_job(self, TranscriptionJobName, **kwargs):
+        self.faults.apply("GetTranscriptionJob")
+        with self._lock:
+            ready_at, uri = self.jobs[TranscriptionJobName]
+        job = {"TranscriptionJobName": TranscriptionJobName, "TranscriptionJobStatus": "IN_PROGRESS"}
+        if time.time() >= ready_at:
+            with self._lock:
+                self._server = self._server or _TranscriptServer()
+            transcript = json.dumps({"results": {"transcripts": [{"transcript": f"Transkript: {uri}"}]}})
+            job.update(TranscriptionJobStatus="COMPLETED", Transcript={
+                "TranscriptFileUri": self._server.publish(TranscriptionJobName, transcript.encode())})
+        return {"TranscriptionJob": job}
+
+    def delete_transcription_job(self, TranscriptionJobName, **kwargs):
+        self.faults.apply("DeleteTranscriptionJob")
+        with self._lock:
+            self.jobs.pop(TranscriptionJobName, None)
+        return {}
+
+class FakePolly:
+    """Returns ~2 kB of fake MP3 per 100 characters, after latency + per_char_sec * len(text)."""
+
+    def __init__(self, faults: Faults = None, per_char_sec: float = 0.0):
+        self.faults = faults or Faults()
+        self.per_char_sec = per_char_sec
+        self.max_chars = 0
+
+    def synthesize_speech(self, Text, **kwargs):
+        self.faults.apply("SynthesizeSpeech")
+        self.max_chars = max(self.max_chars, len(Text))
+        if len(Text) > 3000:
+            raise ClientError({"Error": {"Code": "TextLengthExceededException", "Message": "Text too long"},
+                               "ResponseMetadata": {"HTTPStatusCode": 400}}, "SynthesizeSpeech")
+        if self.per_char_sec:
+            time.sleep(self.per_char_sec * len(Text))
+        return {"AudioStream": io.BytesIO(b"\xff\xfb" * (10 * len(Text) + 1))}
+
+@functools.lru_cache(maxsize=None)
+def _base_image(size_px) -> bytes:
+    try:
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.effect_noise(size_px, 64).convert("RGB").save(buf, format="JPEG", quality=90)
+        return buf.getvalue()
+    except ImportError:
+        return PNG_HEADER + random.randbytes(size_px[0] * size_px[1] // 4)
+
+def synthetic_image(size_px=(2400, 1600), unique: bool = True) -> bytes:
+    """
+    A noise JPEG when Pillow is available (exercises preprocessing), else random
+    bytes behind a PNG header. unique=True appends a random trailer after the
+    image data so every object has a different hash (no result-cache hits).
+    """
+    data = _base_image(tuple(size_px))
+    return data + uuid.uuid4().bytes if unique else data
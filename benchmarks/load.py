@@ -0,0 +1,251 @@
+"""
+Offline load test for the hot paths, against the in-process AWS fakes in
+benchmarks/fakes.py (injected latency and throttling, no network):
+
+  process_images[N]            N fresh images (no result-cache hits)
+  process_audios[M]            M Transcribe jobs (fresh recordings, no transcript-cache hits)
+  process_audios_repeat[M]     the same M recordings every call (transcript-cache hits)
+  lambda_handler[Ni+Ma]        full handler with N images and M audio files
+  batch_job[N]                 batch mode over an S3 prefix of N images (--batch, inline,
+                               job records in a temporary directory)
+  split_text_for_polly[C]      C characters of Turkish text
+  tts_polly_safe[C]            C characters (fresh text, no TTS-cache hits)
+
+For each scenario: calls, errors, throttled fake calls, p50/p95/p99 latency,
+throughput (calls/s and items/s; items are files or characters) and the peak
+traced memory of one extra call under tracemalloc.
+
+Usage:
+    python benchmarks/load.py [--images 1,4] [--audios 1,2] [--texts 500,5000,20000]
+                              [--iterations 10] [--latency s3=0.01,bedrock=0.3]
+                              [--throttle bedrock=0.05] [--quota bedrock=3]
+                              [--json report.json]
+                              [--compare old.json --tolerance 0.25]
+
+--compare exits with status 1 when any scenario's p95 is worse than the old
+report's by more than --tolerance (and by at least 1 ms). Needs boto3
+(botocore) and streamlit importable; the Streamlit config module is imported
+but no app is started.
+"""
+import argparse
+import contextlib
+import gc
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from fakes import Faults, FakeBedrock, FakePolly, FakeS3, FakeTranscribe, synthetic_image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKET = "bench"
+
+# p95 changes smaller than this are timer noise, not regressions
+MIN_REGRESSION_MS = 1.0
+DEFAULT_LATENCY = {"s3": 0.01, "bedrock": 0.3, "transcribe": 0.02, "polly": 0.08}
+
+SENTENCES = [
+    "Gelir vergisi, gerçek kişilerin bir takvim yılı içinde elde ettiği kazanç ve iratların safi tutarı "
+    "üzerinden hesaplanır.",
+    "Ücret, serbest meslek kazancı, ticari kazanç vb. unsurlar gelirin kapsamına girer.",
+    "193 sayılı Kanunun 1. md. hükmüne göre gelir, bir gerçek kişinin safi kazanç ve iratlarıdır.",
+    "Beyanname Mart ayının 1. gününden 31. günü akşamına kadar verilir; ödeme iki taksitte yapılır.",
+    "Örneğin kira geliri 47.000 TL'yi aşan mükellefler yıllık beyanname vermek zorundadır.",
+]
+
+def _parse_rates(text: str, defaults: dict) -> dict:
+    rates = dict(defaults)
+    for part in filter(None, (text or "").split(",")):
+        service, _, value = part.partition("=")
+        if service not in DEFAULT_LATENCY:
+            raise SystemExit(f"unknown service {service!r}; expected one of {', '.join(DEFAULT_LATENCY)}")
+        rates[service] = float(value)
+    return rates
+
+def _ints(text: str) -> list:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+def build_fakes(latency: dict, throttle: dict, quota: dict, jitter: float, job_sec: float) -> dict:
+    faults = {service: Faults(latency[service], jitter * latency[service], throttle.get(service, 0.0),
+                              quota.get(service, 0.0), seed=i)
+              for i, service in enumerate(DEFAULT_LATENCY)}
+    return {"s3": FakeS3(faults["s3"]), "bedrock": FakeBedrock(faults["bedrock"]),
+            "transcribe": FakeTranscribe(faults["transcribe"], job_sec), "polly": FakePolly(faults["polly"]),
+            "faults": faults}
+
+def load_lambda(fakes: dict):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    spec = importlib.util.spec_from_file_location("image_lambda", os.path.join(REPO_ROOT, "image_lambda.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.s3, module.bedrock, module.transcribe = fakes["s3"], fakes["bedrock"], fakes["transcribe"]
+    return module
+
+def load_config(fakes: dict):
+    sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
+    import config
+    config.s3, config.polly = fakes["s3"], fakes["polly"]
+    return config
+
+def text_of_length(chars: int, salt: str = "") -> str:
+    out, size = [], 0
+    for sentence in itertools.cycle(SENTENCES):
+        if size >= chars:
+            break
+        out.append(sentence)
+        size += len(sentence) + 1
+    return (salt + " ".join(out))[:chars]
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def run_scenario(fakes: dict, prepare, call, count_errors, items: int, iterations: int) -> dict:
+    """
+    prepare(i) builds the call's input outside the timed region; call(arg) is timed.
+    One more call runs under tracemalloc for the peak-memory figure.
+    """
+    throttled_before = sum(f.throttled for f in fakes["faults"].values())
+    latencies, errors = [], 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        args = [prepare(i) for i in range(iterations + 1)]
+        wall0 = time.perf_counter()
+        for arg in args[:-1]:
+            t0 = time.perf_counter()
+            try:
+                errors += count_errors(call(arg))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - wall0
+        gc.collect()
+        tracemalloc.start()
+        try:
+            call(args[-1])
+        except Exception:
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    latencies.sort()
+    return {
+        "calls": iterations, "errors": errors,
+        "throttled": sum(f.throttled for f in fakes["faults"].values()) - throttled_before,
+        "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "calls_per_sec": iterations / wall if wall else 0.0,
+        "items_per_sec": iterations * items / wall if wall else 0.0,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+def _errors(out: dict) -> int:
+    return len(out.get("errors") or {})
+
+def scenarios(args, lam, config, fakes):
+    s3 = fakes["s3"]
+    image_px = tuple(int(v) for v in args.image_px.split("x"))
+    serial = itertools.count()
+
+    def image_uris(n):
+        return [s3.put(BUCKET, f"images/{next(serial)}.jpg", synthetic_image(image_px)) for _ in range(n)]
+
+    def audio_uris(m):
+        return [s3.put(BUCKET, f"recordings/{next(serial)}.mp3", b"ID3" + uuid.uuid4().bytes) for _ in range(m)]
+
+    for n in args.images:
+        yield (f"process_images[{n}]", lambda i, n=n: image_uris(n),
+               lambda uris: lam.process_images(uris, None), _errors, n)
+    for m in args.audios:
+        yield (f"process_audios[{m}]", lambda i, m=m: audio_uris(m),
+               lambda uris: lam.process_audios(uris), _errors, m)
+    for m in args.audios:
+        repeated = audio_uris(m)
+        yield (f"process_audios_repeat[{m}]", lambda i, uris=repeated: uris,
+               lambda uris: lam.process_audios(uris), _errors, m)
+    for n, m in itertools.product(args.images, args.audios or [0]):
+        event = lambda i, n=n, m=m: {"data": {"user_input": SENTENCES[0], "image_path": image_uris(n),
+                                              "audio_path": audio_uris(m)}}
+        yield (f"lambda_handler[{n}i+{m}a]", event, lambda ev: lam.lambda_handler(ev, None),
+               lambda out: _errors(out["images"]) + _errors(out["audios"]), n + m)
+    for n in args.batch:
+        def batch_prefix(i, n=n):
+            prefix = f"batch/{next(serial)}/"
+            for j in range(n):
+                s3.put(BUCKET, f"{prefix}{j}.jpg", synthetic_image(image_px))
+            return {"prefix": f"s3://{BUCKET}/{prefix}"}
+        yield (f"batch_job[{n}]", batch_prefix, lambda spec: lam.handle_batch(spec, None),
+               lambda out: out["counts"]["error"] + out["counts"]["pending"], n)
+    for chars in args.texts:
+        yield (f"split_text_for_polly[{chars}]", lambda i, c=chars: text_of_length(c),
+               config.split_text_for_polly, lambda out: 0, chars)
+    for chars in args.texts:
+        yield (f"tts_polly_safe[{chars}]", lambda i, c=chars: text_of_length(c, salt=f"{next(serial)}. "),
+               config.tts_polly_safe, lambda out: 0 if out else 1, chars)
+
+def compare(report: dict, old: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in report.items():
+        before = old.get(name)
+        if not before or result["p95_ms"] - before["p95_ms"] < MIN_REGRESSION_MS:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=_ints, default=[1, 4])
+    parser.add_argument("--audios", type=_ints, default=[1, 2])
+    parser.add_argument("--texts", type=_ints, default=[500, 5000, 20000])
+    parser.add_argument("--batch", type=_ints, default=[], help="batch_job sizes, e.g. 50,200")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--image-px", default="2400x1600", help="synthetic image size, WxH")
+    parser.add_argument("--latency", default="", help="per-call seconds, e.g. s3=0.01,bedrock=0.3")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of latency")
+    parser.add_argument("--throttle", default="", help="random throttle rate per service, e.g. bedrock=0.05")
+    parser.add_argument("--quota", default="", help="calls/s above which a service throttles, e.g. bedrock=3")
+    parser.add_argument("--job-sec", type=float, default=0.2, help="fake Transcribe job duration")
+    parser.add_argument("--only", help="run only scenarios whose name contains this text")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="earlier --json report to check p95 regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    fakes = build_fakes(_parse_rates(args.latency, DEFAULT_LATENCY),
+                        _parse_rates(args.throttle, {}), _parse_rates(args.quota, {}), args.jitter, args.job_sec)
+    lam, config = load_lambda(fakes), load_config(fakes)
+    lam.BATCH_JOB_DIR = tempfile.mkdtemp(prefix="batch-jobs-")
+
+    report = {}
+    header = (f"{'scenario':<28}{'calls':>6}{'err':>5}{'thr':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'calls/s':>9}{'items/s':>11}{'peak MB':>9}")
+    print(header)
+    for name, prepare, call, count_errors, items in scenarios(args, lam, config, fakes):
+        if args.only and args.only not in name:
+            continue
+        r = run_scenario(fakes, prepare, call, count_errors, items, args.iterations)
+        report[name] = r
+        print(f"{name:<28}{r['calls']:>6}{r['errors']:>5}{r['throttled']:>5}{r['p50_ms']:>10.1f}"
+              f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['calls_per_sec']:>9.2f}{r['items_per_sec']:>11.1f}"
+              f"{r['peak_mb']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
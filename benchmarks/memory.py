@@ -0,0 +1,79 @@
+"""
+Peak memory of image_lambda.process_images for one large synthetic image,
+measured with tracemalloc. S3 and Bedrock are the in-memory fakes from
+benchmarks/fakes.py: get_object streams the image from a BytesIO,
+invoke_model only looks at the request body. Random bytes with a PNG header
+do not decode, so Pillow (if installed) passes them through unchanged.
+
+Usage:
+    python benchmarks/memory.py [--sizes 4,8,16] [--baseline <git-ref>]
+
+Reported: peak traced bytes during the call and peak / image size.
+"""
+import argparse
+import gc
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from fakes import PNG_HEADER, FakeBedrock, FakeS3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+def _load(path: str, name: str):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _baseline_module(ref: str, tmp: str):
+    source = subprocess.run(["git", "show", f"{ref}:image_lambda.py"], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    path = os.path.join(tmp, "image_lambda_baseline.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    return _load(path, "image_lambda_baseline")
+
+def measure(module, size: int) -> dict:
+    s3, bedrock = FakeS3(), FakeBedrock()
+    module.s3, module.bedrock = s3, bedrock
+    uri = s3.put("bench", f"images/synthetic-{size}.png", PNG_HEADER + os.urandom(size - len(PNG_HEADER)))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        out = module.process_images([uri], "image/png")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if out.get("errors"):
+        raise RuntimeError(out["errors"])
+    return {"peak": peak, "ratio": peak / size, "request": bedrock.request_bytes}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="4,8,16", help="image sizes in MB")
+    parser.add_argument("--baseline", help="git ref to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+    sizes = [int(float(s) * MB) for s in args.sizes.split(",")]
+
+    modules = {"current": _load(os.path.join(REPO_ROOT, "image_lambda.py"), "image_lambda")}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.baseline:
+            modules[args.baseline] = _baseline_module(args.baseline, tmp)
+        for module in modules.values():
+            measure(module, MB)  # lazy imports (Pillow, thread pool) outside the measurement
+
+        print(f"{'image':>8} {'module':<14} {'peak MB':>9} {'peak/image':>11} {'request MB':>11}")
+        for size in sizes:
+            for name, module in modules.items():
+                r = measure(module, size)
+                print(f"{size / MB:>7.0f}M {name:<14} {r['peak'] / MB:>9.1f} {r['ratio']:>10.2f}x "
+                      f"{r['request'] / MB:>11.1f}")
+
+if __name__ == "__main__":
+    sys.exit(main())
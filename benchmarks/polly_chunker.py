@@ -0,0 +1,159 @@
+"""
+Polly text chunker (streamlit_app/polly_text.py) on long generated documents:
+Turkish legal prose with abbreviations ("vb.", "md.", "No."), ordinals,
+bulleted/numbered lists and paragraphs.
+
+For every document size: chunks produced vs. the lower bound ceil(chars/limit),
+mean chunk fill, and time (ms and µs per 1000 characters, which stays flat
+when the chunker is linear). --baseline compares against split_text_for_polly
+as it was at a git ref.
+
+--check runs randomized property checks (seeded, --cases documents) on both
+plain and SSML output and exits with status 1 on the first violation:
+  - no empty chunks, every chunk within the limit
+  - the words of the document come out in order, none lost or duplicated
+    (bullet markers excepted)
+  - no chunk ends right after an abbreviation or an ordinal
+  - SSML chunks are well-formed <speak> documents
+
+Usage:
+    python benchmarks/polly_chunker.py [--sizes 10000,100000,1000000] [--limit 2500]
+                                       [--baseline <git-ref>] [--check --cases 300]
+"""
+import argparse
+import ast
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "streamlit_app"))
+import polly_text  # noqa: E402
+
+SENTENCES = [
+    "Gelir vergisi, gerçek kişilerin bir takvim yılı içinde elde ettiği kazanç ve iratların safi tutarı "
+    "üzerinden hesaplanır.",
+    "Ücret, serbest meslek kazancı, ticari kazanç vb. unsurlar gelirin kapsamına girer.",
+    "193 sayılı Kanunun 1. md. hükmüne göre gelir, bir gerçek kişinin safi kazanç ve iratlarıdır.",
+    "Beyanname Mart ayının 1. gününden 31. günü akşamına kadar verilir; ödeme iki taksitte yapılır.",
+    "Örneğin kira geliri 47.000 TL'yi aşan mükellefler yıllık beyanname vermek zorundadır.",
+    "Konu, 7194 sayılı Kanun ile değişik VUK md. 359 kapsamında değerlendirilir.",
+    "İlgili tebliğ (Seri No. 312) uyarınca düzeltme beyannamesi verilmelidir.",
+    "Bkz. GVK md. 94 ve KDVK md. 29 hükümleri.",
+    "Peki, pişmanlıkla beyan mümkün müdür?",
+    "Evet!",
+]
+LIST_MARKERS = ("- ", "* ", "• ")
+ABBREVIATION_END = re.compile(r"(?:^|\s)(?:vb|md|No|Bkz|VUK|GVK|KDVK|\d+)\.$")
+
+def generate(chars: int, rng: random.Random) -> str:
+    """A document of about `chars` characters: paragraphs, bulleted and numbered lists, a rare run-on sentence."""
+    out, size = [], 0
+    while size < chars:
+        kind = rng.random()
+        if kind < 0.15:
+            marker = rng.choice(LIST_MARKERS + ("1. ", "a) "))
+            items = [(marker if marker in LIST_MARKERS else f"{i}. ") + rng.choice(SENTENCES)
+                     for i in range(1, rng.randint(2, 6))]
+            block = "\n".join(items)
+        elif kind < 0.18:
+            block = " ".join(rng.choice(SENTENCES).rstrip(".!?") + "," for _ in range(rng.randint(20, 60))) + "."
+        else:
+            block = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 8)))
+        out.append(block)
+        size += len(block) + 2
+    return "\n\n".join(out)
+
+def expected_words(text: str) -> list:
+    words = []
+    for line in text.splitlines():
+        tokens = line.split()
+        if tokens and tokens[0] + " " in LIST_MARKERS:
+            tokens = tokens[1:]
+        words.extend(tokens)
+    return words
+
+def check(text: str, limit: int) -> None:
+    for ssml in (False, True):
+        chunks = polly_text.split_text(text, limit, ssml)
+        words = []
+        for chunk in chunks:
+            assert chunk.strip(), "empty chunk"
+            assert len(chunk) <= limit, f"chunk of {len(chunk)} > {limit}"
+            if ssml:
+                root = ET.fromstring(chunk)
+                assert root.tag == "speak", root.tag
+                plain = "".join(root.itertext())
+            else:
+                plain = chunk
+            words.extend(plain.split())
+            if chunk is not chunks[-1] and max(map(len, plain.split(". "))) < limit // 2:
+                assert not ABBREVIATION_END.search(plain.rstrip()), f"chunk ends after an abbreviation: {plain[-40:]!r}"
+        assert words == expected_words(text), "words lost, duplicated or reordered"
+
+def _baseline_split(ref: str):
+    """split_text_for_polly from config.py at `ref`, loaded without importing the Streamlit app."""
+    source = subprocess.run(["git", "show", f"{ref}:streamlit_app/config.py"], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    tree = ast.parse(source)
+    func = next(node for node in tree.body if isinstance(node, ast.FunctionDef)
+                and node.name == "split_text_for_polly")
+    namespace = {"MAX_POLLY_CHARS": 2500, "List": list, "polly_text": polly_text}
+    exec(compile(ast.Module(body=[func], type_ignores=[]), "baseline", "exec"), namespace)
+    return namespace["split_text_for_polly"]
+
+def measure(split, text: str, limit: int, repeat: int) -> dict:
+    best = math.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chunks = split(text, limit)
+        best = min(best, time.perf_counter() - t0)
+    chunks = [c for c in chunks if c]
+    return {"chunks": len(chunks), "empty": len(split(text, limit)) - len(chunks),
+            "fill": sum(map(len, chunks)) / (len(chunks) * limit) if chunks else 0.0,
+            "ms": best * 1000, "us_per_kchar": best * 1e6 / (len(text) / 1000)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="document sizes in characters")
+    parser.add_argument("--limit", type=int, default=2500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="git ref to compare against, e.g. HEAD~1")
+    parser.add_argument("--check", action="store_true", help="run the randomized property checks")
+    parser.add_argument("--cases", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    if args.check:
+        for case in range(args.cases):
+            text = generate(rng.choice([50, 500, 3000, 20000]), rng)
+            limit = rng.choice([200, 600, args.limit])
+            try:
+                check(text, limit)
+            except AssertionError as e:
+                print(f"FAIL case {case} (limit {limit}): {e}\n--- document ---\n{text}")
+                return 1
+        print(f"property checks: {args.cases} documents OK")
+
+    splitters = {"current": lambda text, limit: polly_text.split_text(text, limit)}
+    if args.baseline:
+        splitters[args.baseline] = _baseline_split(args.baseline)
+    print(f"{'chars':>9} {'splitter':<12} {'chunks':>7} {'bound':>6} {'empty':>6} {'fill':>6} {'ms':>9} "
+          f"{'µs/kchar':>9}")
+    for chars in (int(v) for v in args.sizes.split(",")):
+        text = generate(chars, rng)
+        bound = math.ceil(len(text) / args.limit)
+        for name, split in splitters.items():
+            r = measure(split, text, args.limit, args.repeat)
+            print(f"{len(text):>9} {name:<12} {r['chunks']:>7} {bound:>6} {r['empty']:>6} {r['fill']:>6.1%} "
+                  f"{r['ms']:>9.1f} {r['us_per_kchar']:>9.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
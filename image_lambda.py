@@ -1,23 +1,195 @@
-import boto3
 import base64
+import hashlib
+import io
 import json
 import mimetypes
+import os
+import random
+import re
+import threading
 import urllib.parse
-import urllib.request
 import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Optional, List, Dict, Any
 
-# --- Clients (reuse) ---
-s3 = boto3.client("s3")
-bedrock = boto3.client("bedrock-runtime")
-transcribe = boto3.client("transcribe")
+# --- Clients (lazy, reuse) ---
+# boto3 import'u ve istemci kurulumu ilk kullanımda yapılır; sadece metin içeren
+# istekler (görsel/ses yok) bu maliyeti hiç ödemez. İstemciler sıcak çağrılar
+# arasında yeniden kullanılır.
+CLIENT_POOL_CONNECTIONS = 16
+# Bedrock/Transcribe'da yeniden deneme ve hız kontrolü _call_limited'dadır; botocore'un
+# kendi denemeleri kapatılır ki denemeler çarpılmasın.
+CLIENT_CONFIG_OVERRIDES: Dict[str, Dict[str, Any]] = {
+    "bedrock-runtime": {"read_timeout": 120, "retries": {"total_max_attempts": 1, "mode": "standard"}},
+    "transcribe": {"retries": {"total_max_attempts": 1, "mode": "standard"}},
+}
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+def _client_config(service: str):
+    from botocore.config import Config
+    opts = {
+        "max_pool_connections": CLIENT_POOL_CONNECTIONS,
+        "tcp_keepalive": True,
+        "connect_timeout": 5,
+        "read_timeout": 60,
+        "retries": {"max_attempts": 5, "mode": "adaptive"},
+    }
+    opts.update(CLIENT_CONFIG_OVERRIDES.get(service, {}))
+    return Config(**opts)
+
+def get_client(service: str):
+    """Servis başına tek, thread-safe ve tembel oluşturulan boto3 istemcisi."""
+    client = _clients.get(service)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(service)
+            if client is None:
+                import boto3
+                client = boto3.client(service, config=_client_config(service))
+                _clients[service] = client
+    return client
+
+class _LazyClient:
+    """Modül seviyesindeki s3/bedrock/transcribe adları için vekil; ilk erişimde istemciyi kurar."""
+    def __init__(self, service: str):
+        self._service = service
+
+    def __getattr__(self, name: str):
+        return getattr(get_client(self._service), name)
+
+s3 = _LazyClient("s3")
+bedrock = _LazyClient("bedrock-runtime")
+transcribe = _LazyClient("transcribe")
+
+def warm_up(services: Tuple[str, ...] = ("s3", "bedrock-runtime", "transcribe")) -> Dict[str, float]:
+    """İstemcileri önceden kurar (ör. zamanlanmış 'warmup' çağrısı); servis başına süreyi döndürür."""
+    timings = {}
+    for service in services:
+        t0 = time.perf_counter()
+        get_client(service)
+        timings[service] = round(time.perf_counter() - t0, 4)
+    return timings
+
+# --- HTTP (Transcribe transcript indirme) ---
+# Sıcak çağrılar arasında yaşayan tek urllib3 havuzu: keep-alive, gzip, zaman aşımları ve
+# idempotent GET'lerde yeniden deneme. urllib3 Lambda Python runtime'ında botocore ile gelir.
+HTTP_CONNECT_TIMEOUT_SEC = 5
+HTTP_READ_TIMEOUT_SEC = 30
+HTTP_RETRIES = 3
+_http_pool = None
+_http_pool_lock = threading.Lock()
+
+def get_http_pool():
+    global _http_pool
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                import urllib3
+                _http_pool = urllib3.PoolManager(
+                    num_pools=8, maxsize=CLIENT_POOL_CONNECTIONS, block=False,
+                    timeout=urllib3.Timeout(connect=HTTP_CONNECT_TIMEOUT_SEC, read=HTTP_READ_TIMEOUT_SEC),
+                    retries=urllib3.Retry(total=HTTP_RETRIES, backoff_factor=0.3,
+                                          status_forcelist=(429, 500, 502, 503, 504)),
+                    headers={"Accept-Encoding": "gzip, deflate"},
+                )
+    return _http_pool
+
+def http_stats() -> Dict[str, Any]:
+    """Havuzdaki istek / yeni bağlantı sayıları; reuse = bağlantı açmadan giden isteklerin oranı."""
+    if _http_pool is None:
+        return {"requests": 0, "connections": 0, "reuse": 0.0}
+    requests_total = connections = 0
+    for key in _http_pool.pools.keys():
+        pool = _http_pool.pools.get(key)
+        if pool is not None:
+            requests_total += pool.num_requests
+            connections += pool.num_connections
+    reuse = 1 - connections / requests_total if requests_total else 0.0
+    return {"requests": requests_total, "connections": connections, "reuse": round(reuse, 3)}
+
+_pil_modules: Optional[Tuple[Any, Any]] = None
+
+def _pil() -> Tuple[Any, Any]:
+    """
+    (Image, ImageOps) ya da Pillow yoksa (None, None); ön işleme atlanır, ham bayt
+    gönderilir ve sizes'ta preprocessed=False görünür. Pillow Lambda runtime'ında yoktur,
+    requirements-lambda.txt ile pakete / layer'a eklenir.
+    """
+    global _pil_modules
+    if _pil_modules is None:
+        try:
+            from PIL import Image, ImageOps
+            _pil_modules = (Image, ImageOps)
+        except ImportError:
+            print("Pillow not installed; image preprocessing disabled (see requirements-lambda.txt)")
+            _pil_modules = (None, None)
+    return _pil_modules
 
 # --- Config ---
 MODEL_ID = "arn:aws:bedrock:us-east-1:777179738691:inference-profile/global.anthropic.claude-sonnet-4-5-20250929-v1:0"
 MAX_TOKENS = 2048
 TRANSCRIBE_WAIT_SEC = 75
-TRANSCRIBE_POLL_SEC = 3
+TRANSCRIBE_POLL_SEC = 3          # poll aralığının üst sınırı
+TRANSCRIBE_POLL_MIN_SEC = 0.5    # ilk / değişiklik sonrası poll aralığı
+TRANSCRIBE_POLL_BACKOFF = 1.6
+LAMBDA_SAFETY_MARGIN_SEC = 2     # yanıtı döndürmek için bırakılan pay
+IMAGE_MAX_WORKERS = 4  # aynı anda uçuşta olabilecek en fazla Bedrock çağrısı
+IMAGE_MAX_EDGE_PX = 1568          # modelin etkin azami çözünürlüğü (uzun kenar)
+IMAGE_TARGET_BYTES = 1_500_000    # yeniden sıkıştırma bütçesi (base64 öncesi)
+IMAGE_JPEG_QUALITIES = (85, 75, 65, 50, 40)
+IMAGE_BATCH_MODE = False          # True: çok sayfalı belgeler tek Bedrock mesajında analiz edilir
+BATCH_MAX_IMAGES = 8              # tek mesajdaki en fazla görsel
+BATCH_MAX_B64_BYTES = 12_000_000  # tek mesajdaki toplam base64 yükü
+BATCH_MAX_TOKENS = 8192
+IMAGE_MAX_BYTES = 20 * 1024 * 1024           # tek görsel; aşan nesne indirilmeden reddedilir
+REQUEST_MAX_IMAGE_BYTES = 60 * 1024 * 1024   # bir çağrıda indirilecek toplam görsel baytı
+S3_READ_CHUNK = 1024 * 1024
+B64_ENCODE_CHUNK = 3 * 256 * 1024            # 3'ün katı: parçalar arası base64 dolgusu oluşmaz
+
+# --- Tracing ---
+# Kapalıyken span() paylaşılan bir no-op döndürür; ölçüm ve EMF satırı yoktur.
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_NAMESPACE = "GelirVergisi/ImageLambda"
+
+# --- Rate limiting ---
+# Servis başına (başlangıç hızı, en yüksek hız) istek/sn; kısılma (throttling) gelince
+# hız yarıya iner, başarılı çağrılarla yavaşça en yüksek hıza döner (AIMD).
+RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "bedrock": (5.0, 20.0),
+    "transcribe": (10.0, 20.0),
+}
+RATE_MIN_PER_SEC = 0.2
+RETRY_MAX_ATTEMPTS = 6
+RETRY_BASE_SEC = 0.25
+RETRY_MAX_SEC = 8.0
+LAMBDA_MAX_SEC = 900
+
+# --- Result cache ---
+RESULT_CACHE_TTL_SEC = 7 * 24 * 3600
+RESULT_CACHE_MAX_ITEMS = 256                  # sıcak (in-memory) LRU katmanı
+RESULT_CACHE_S3_URI: Optional[str] = None     # ör. "s3://gelir-vergisi/cache/image-analysis/"
+RESULT_CACHE_DIR: Optional[str] = None        # ör. "/tmp/image-analysis-cache" (S3 yoksa)
+RESULT_CACHE_DIR_MAX_BYTES = 64 * 1024 * 1024
+# Transkriptler de aynı katmanlarda tutulur; anahtar ses nesnesinin ETag'i ve boyutudur.
+# İş adı bu anahtardan türetilir: aynı kaydın eşzamanlı istekleri tek Transcribe işine bağlanır.
+TRANSCRIBE_JOB_PREFIX = "flow-asr"
+TRANSCRIBE_SETTINGS = "identify-language"    # transkripti etkileyen iş ayarları (anahtara girer)
+
+# --- Batch jobs ---
+# İş kaydı, birim durumları ve JSONL sonuçlar burada tutulur; BATCH_JOB_DIR verilirse
+# (yerel deneme) S3 yerine o dizin kullanılır.
+BATCH_JOB_S3_URI: Optional[str] = "s3://gelir-vergisi/batch-jobs/"
+BATCH_JOB_DIR: Optional[str] = None
+BATCH_UNIT_SIZE = 25                  # bir iş biriminde (tek Lambda çağrısı) en fazla öğe
+BATCH_CHECKPOINT_ITEMS = 8            # her bu kadar öğede bir durum kaydedilir
+BATCH_ITEM_MAX_ATTEMPTS = 3
+BATCH_MIN_REMAINING_SEC = 30          # kalan süre bunun altına inince birim devredilir
+BATCH_DISPATCH_LEASE_SEC = 120        # devredilen birim bu süre içinde başka çağrıya verilmez
+BATCH_FANOUT = True                   # birimleri aynı fonksiyonun asenkron çağrılarına dağıt
+BATCH_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
 
 ANALYSIS_PROMPT = (
     "Görseli analiz et. Metin varsa metnin ana fikrini özetle. "
@@ -26,193 +198,957 @@ ANALYSIS_PROMPT = (
     "Maksimum 7 cümlede özetle."
 )
 
+BATCH_ANALYSIS_PROMPT = (
+    "Yukarıdaki görseller aynı belgenin sayfaları olabilir; her biri 'image_<n>' etiketiyle verildi. "
+    "Her görseli ayrı ayrı analiz et, gerekirse diğer sayfaları bağlam olarak kullan. "
+    + ANALYSIS_PROMPT +
+    " Her görselin yanıtını sırayla yaz ve her yanıtı tek başına '### image_<n>' satırıyla başlat."
+)
+
 # ----------------- helpers (common) -----------------
-def _infer_media_type(key: str, explicit: Optional[str] = None) -> str:
+_IMAGE_MAGIC = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+def _sniff_image_type(data: Optional[bytes]) -> Optional[str]:
+    if not data:
+        return None
+    for magic, mt in _IMAGE_MAGIC:
+        if data.startswith(magic):
+            return mt
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def _infer_media_type(key: str, explicit: Optional[str] = None, data: Optional[bytes] = None) -> str:
+    """Öncelik: içerikteki magic bytes -> açık ipucu -> uzantı -> image/jpeg"""
+    sniffed = _sniff_image_type(data)
+    if sniffed:
+        return sniffed
     if explicit:
         return explicit
     key_no_q = key.split("?", 1)[0]
     mt, _ = mimetypes.guess_type(key_no_q)
     return mt if mt in {"image/jpeg", "image/png"} else "image/jpeg"
 
-def _parse_s3_from_uri(s3_uri: str) -> Tuple[str, str]:
-    if not s3_uri.startswith("s3://"):
+def _parse_s3_from_uri(s3_uri: str, allow_empty_key: bool = False) -> Tuple[str, str]:
+    """allow_empty_key: önek (prefix) URI'leri için; "s3://bucket" ve "s3://bucket/" tüm bucket'tır."""
+    if not isinstance(s3_uri, str) or not s3_uri.startswith("s3://"):
         raise ValueError(f"Invalid s3Uri: {s3_uri}")
     without = s3_uri[len("s3://") :]
     bucket, _, key = without.partition("/")
-    if not bucket or not key:
+    if not bucket or not (key or allow_empty_key):
         raise ValueError(f"Invalid s3Uri (missing bucket/key): {s3_uri}")
     return bucket, key
 
-def _extract_from_s3_event(event) -> List[str]:
-    uris = []
-    try:
-        for rec in event.get("Records", []):
+# ----------------- tracing -----------------
+class _Trace:
+    """
+    Bir çağrının aşama süreleri: {aşama: [adet, toplam_ms, en_uzun_ms]}.
+    Havuz thread'lerinden aynı anda yazılabilir.
+    """
+    def __init__(self, correlation_id: str):
+        self.correlation_id = correlation_id
+        self.stages: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+
+    def breakdown(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {stage: {"count": n, "total_ms": round(total, 1), "max_ms": round(peak, 1)}
+                    for stage, (n, total, peak) in self.stages.items()}
+
+    def emf(self) -> Dict[str, Any]:
+        """CloudWatch Embedded Metric Format: aşama başına <aşama>_ms metriği (toplam süre)."""
+        stages = self.breakdown()
+        doc: Dict[str, Any] = {
+            "_aws": {"Timestamp": int(time.time() * 1000), "CloudWatchMetrics": [{
+                "Namespace": TRACE_NAMESPACE, "Dimensions": [[]],
+                "Metrics": [{"Name": f"{stage}_ms", "Unit": "Milliseconds"} for stage in stages],
+            }]},
+            "correlation_id": self.correlation_id,
+            "stages": stages,
+        }
+        for stage, values in stages.items():
+            doc[f"{stage}_ms"] = values["total_ms"]
+        return doc
+
+class _Span:
+    __slots__ = ("trace", "stage", "t0")
+
+    def __init__(self, trace: _Trace, stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.record(self.stage, (time.perf_counter() - self.t0) * 1000)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+# Lambda bir ortamda aynı anda tek çağrı işler; etkin iz modül düzeyinde tutulur
+# ki havuz thread'leri de görebilsin.
+_active_trace: Optional[_Trace] = None
+
+def span(stage: str):
+    """with span("s3.get"): ... — izleme kapalıysa/etkin iz yoksa maliyetsiz no-op."""
+    trace = _active_trace
+    return _NOOP_SPAN if trace is None else _Span(trace, stage)
+
+def _start_trace(correlation_id: Optional[str]) -> Optional[_Trace]:
+    global _active_trace
+    _active_trace = _Trace(correlation_id or uuid.uuid4().hex) if TRACE_ENABLED else None
+    return _active_trace
+
+def _finish_trace(trace: Optional[_Trace]) -> Optional[Dict[str, Any]]:
+    """EMF satırını stdout'a yazar; yanıta eklenecek özeti döndürür."""
+    global _active_trace
+    _active_trace = None
+    if trace is None:
+        return None
+    print(json.dumps(trace.emf(), ensure_ascii=False))
+    return {"correlation_id": trace.correlation_id, "stages": trace.breakdown()}
+
+# ----------------- rate limiting -----------------
+_THROTTLE_CODES = {"ThrottlingException", "Throttling", "TooManyRequestsException", "LimitExceededException",
+                   "RequestLimitExceeded", "ServiceQuotaExceededException"}
+_TRANSIENT_CODES = {"ServiceUnavailableException", "InternalServerException", "InternalFailure",
+                    "ModelNotReadyException", "ServiceUnavailable"}
+_TRANSIENT_ERRORS = {"EndpointConnectionError", "ConnectionClosedError", "ReadTimeoutError", "ConnectTimeoutError"}
+
+def _error_code(e: Exception) -> str:
+    response = getattr(e, "response", None)
+    return (response or {}).get("Error", {}).get("Code", "") if isinstance(response, dict) else ""
+
+class AdaptiveLimiter:
+    """
+    Thread-safe token bucket; hız kısılma sinyallerine göre uyarlanır.
+    Örnek modül düzeyinde yaşar, öğrenilen hız sıcak çağrılar arasında korunur.
+    """
+    def __init__(self, name: str, rate: float, max_rate: float, min_rate: float = RATE_MIN_PER_SEC,
+                 burst: Optional[float] = None):
+        self.name = name
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "throttles": 0, "transient_errors": 0, "wait_ms": 0.0}
+
+    def acquire(self, deadline: Optional[float] = None) -> None:
+        """Bir jeton alır; son tarihten (time.time()) önce alınamayacaksa TimeoutError."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._stats["calls"] += 1
+                    self._stats["wait_ms"] += waited * 1000
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and time.time() + wait > deadline:
+                raise TimeoutError(f"{self.name} rate limit: no capacity before the Lambda deadline")
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self._stats["throttles"] += 1
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["wait_ms"] = round(out["wait_ms"], 1)
+            out["rate_per_sec"] = round(self.rate, 2)
+        return out
+
+LIMITERS: Dict[str, AdaptiveLimiter] = {name: AdaptiveLimiter(name, rate, max_rate)
+                                        for name, (rate, max_rate) in RATE_LIMITS.items()}
+# Çağrının son tarihi (time.time()); lambda_handler kurar. Lambda aynı anda tek çağrı işler.
+_invocation_deadline: Optional[float] = None
+
+def _call_limited(service: str, fn, *args, deadline: Optional[float] = None, **kwargs):
+    """
+    fn(*args, **kwargs) çağrısını servisin limiter'ından geçirir. Kısılma ve geçici
+    hatalarda tam jitter'lı üstel geri çekilmeyle RETRY_MAX_ATTEMPTS'e kadar dener;
+    bekleme çağrının son tarihini aşacaksa son hatayı yükseltir.
+    """
+    limiter = LIMITERS[service]
+    deadline = deadline or _invocation_deadline
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        limiter.acquire(deadline)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            code = _error_code(e)
+            if code in _THROTTLE_CODES:
+                limiter.on_throttle()
+            elif code in _TRANSIENT_CODES or type(e).__name__ in _TRANSIENT_ERRORS:
+                limiter.count("transient_errors")
+            else:
+                raise
+            backoff = random.uniform(0, min(RETRY_MAX_SEC, RETRY_BASE_SEC * 2 ** attempt))
+            if attempt + 1 == RETRY_MAX_ATTEMPTS or (deadline is not None and time.time() + backoff > deadline):
+                raise
+            limiter.count("retries")
+            time.sleep(backoff)
+            continue
+        limiter.on_success()
+        return result
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in LIMITERS.items()}
+
+# ----------------- input schema -----------------
+# Alan başına açık öncelik sırası: "görünüm.anahtar" listesi, soldan sağa ilk dolu değer kazanır.
+# Görünümler olaydan tek geçişte bir kez çıkarılır:
+#   data    -> Flow 'data' nesnesi (event.data ya da node.inputs[name=="data"], JSON ise bir kez parse edilir)
+#   event   -> üst seviye alanlar (Lambda konsol testi vs.)
+#   records -> S3 event Records'tan s3:// URI'ları
+#   node    -> node.inputs tekil alanları (eski desen)
+INPUT_SCHEMA_SPEC: Dict[str, Tuple[str, List[str]]] = {
+    "image_path": ("uri_list", ["data.image_path", "event.image_path", "event.s3Uri", "event.s3_uri",
+                                "records.uris", "node.image_path"]),
+    "audio_path": ("uri_list", ["data.audio_path", "event.audio_path", "event.audioUri", "event.audio_uri",
+                                "node.audio_path"]),
+    "user_input": ("text", ["data.user_input", "event.user_input", "event.message", "event.prompt",
+                            "data.message", "data.prompt", "node.user_input", "node.message", "node.prompt"]),
+    "mediaType": ("text", ["data.mediaType", "event.mediaType", "node.mediaType"]),
+    "batch_images": ("flag", ["data.batch_images", "event.batch_images", "node.batch_images"]),
+    "correlation_id": ("text", ["data.correlation_id", "event.correlation_id", "node.correlation_id"]),
+}
+
+def _as_uri_list(value: Any) -> Optional[List[str]]:
+    if isinstance(value, str):
+        return [value] if value.strip() else None
+    if isinstance(value, list):
+        uris = [v for v in value if isinstance(v, str) and v.strip()]
+        return uris or None
+    return None
+
+def _as_text(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) and value else None
+
+def _as_flag(value: Any) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in {"true", "false", "1", "0"}:
+        return value.lower() in {"true", "1"}
+    return None
+
+_COERCERS = {"uri_list": _as_uri_list, "text": _as_text, "flag": _as_flag}
+
+def _compile_schema(spec: Dict[str, Tuple[str, List[str]]]) -> List[Tuple[str, Any, Tuple[Tuple[str, str], ...]]]:
+    """Yolları (görünüm, anahtar) çiftlerine, türleri dönüştürücü fonksiyonlara bir kez çevirir."""
+    compiled = []
+    for field, (kind, paths) in spec.items():
+        if kind not in _COERCERS:
+            raise ValueError(f"Unknown input kind for {field}: {kind}")
+        steps = []
+        for path in paths:
+            view, _, key = path.partition(".")
+            if view not in {"data", "event", "records", "node"} or not key:
+                raise ValueError(f"Invalid input schema path: {path}")
+            steps.append((view, key))
+        compiled.append((field, _COERCERS[kind], tuple(steps)))
+    return compiled
+
+_INPUT_SCHEMA = _compile_schema(INPUT_SCHEMA_SPEC)
+
+def _input_views(event: dict, warnings: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Olayı tek geçişte görünümlere ayırır; bozuk girdiler yutulmaz, warnings'e yazılır."""
+    node_vals: Dict[str, Any] = {}
+    node = event.get("node")
+    inputs = node.get("inputs", []) if isinstance(node, dict) else []
+    if not isinstance(inputs, list):
+        warnings.append("node.inputs is not a list")
+        inputs = []
+    for inp in inputs:
+        if isinstance(inp, dict) and isinstance(inp.get("name"), str):
+            node_vals[inp["name"]] = inp.get("value")
+
+    data = event.get("data") if isinstance(event.get("data"), dict) else None
+    if data is None and "data" in node_vals:
+        raw = node_vals["data"]
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(raw)
+            except ValueError as e:
+                warnings.append(f"node.inputs data is not valid JSON: {e}")
+                raw = None
+        if isinstance(raw, dict):
+            data = raw
+        elif raw is not None:
+            warnings.append("node.inputs data is not an object")
+
+    uris: List[str] = []
+    records = event.get("Records") or []
+    if not isinstance(records, list):
+        warnings.append("Records is not a list")
+        records = []
+    for i, rec in enumerate(records):
+        try:
             b = rec["s3"]["bucket"]["name"]
             k = urllib.parse.unquote_plus(rec["s3"]["object"]["key"])
             uris.append(f"s3://{b}/{k}")
-    except Exception:
-        pass
-    return uris
-
-# NEW: Flow/Inline Lambda input'tan "data" nesnesini çıkar
-def _pluck_flow_data(event: dict) -> Optional[dict]:
-    # 1) Top-level "data"
-    if isinstance(event.get("data"), dict):
-        return event["data"]
-    # 2) node.inputs[*].name == "data"
-    try:
-        for inp in event.get("node", {}).get("inputs", []):
-            if inp.get("name") == "data":
-                val = inp.get("value")
-                if isinstance(val, str):
-                    try:
-                        return json.loads(val)
-                    except Exception:
-                        return None
-                if isinstance(val, dict):
-                    return val
-    except Exception:
-        pass
-    return None
+        except (KeyError, TypeError) as e:
+            warnings.append(f"Records[{i}] is not an S3 record: missing {e}")
 
-def _extract_from_flow_node(event) -> Dict[str, Any]:
-    """
-    Flow / Bedrock Flow:
-      - Tercihen 'data' nesnesini oku ve içinden alanları çek.
-      - Yoksa node.inputs'taki tekil alan adlarını dene (eski desen).
-    """
-    # Öncelik: data nesnesi
-    doc = _pluck_flow_data(event)
-    if isinstance(doc, dict):
-        img = doc.get("image_path")
-        aud = doc.get("audio_path")
-        user_input = doc.get("user_input") or doc.get("message") or doc.get("prompt")
-        media_type = doc.get("mediaType")
-        if isinstance(img, str): img = [img]
-        if isinstance(aud, str): aud = [aud]
-        return {
-            "image_path": img, "audio_path": aud,
-            "user_input": user_input, "mediaType": media_type
-        }
+    return {"data": data or {}, "event": event, "records": {"uris": uris}, "node": node_vals}
 
-    # Geriye uyumluluk: node.inputs tekil alanlar
-    out = {"image_path": None, "audio_path": None, "user_input": None, "mediaType": None}
-    try:
-        inputs = event.get("node", {}).get("inputs", [])
-        vals = {i.get("name"): i.get("value") for i in inputs if isinstance(i, dict)}
-        img = vals.get("image_path")
-        aud = vals.get("audio_path")
-        if isinstance(img, str): img = [img]
-        if isinstance(aud, str): aud = [aud]
-        out["image_path"] = img
-        out["audio_path"] = aud
-        out["user_input"] = vals.get("user_input") or vals.get("message") or vals.get("prompt")
-        out["mediaType"] = vals.get("mediaType")
-    except Exception:
-        pass
+def parse_event_inputs(event: dict) -> Dict[str, Any]:
+    """
+    INPUT_SCHEMA_SPEC'e göre tüm alanları tek geçişte çözer.
+    DÖNÜŞ: {alan: değer, ..., "sources": {alan: "görünüm.anahtar"}, "warnings": [...], "parse_ms": float}
+    """
+    t0 = time.perf_counter()
+    warnings: List[str] = []
+    if not isinstance(event, dict):
+        warnings.append(f"event is {type(event).__name__}, expected object")
+        event = {}
+    views = _input_views(event, warnings)
+    out: Dict[str, Any] = {}
+    sources: Dict[str, str] = {}
+    for field, coerce, steps in _INPUT_SCHEMA:
+        out[field] = None
+        for view, key in steps:
+            value = views[view].get(key)
+            if value is None:
+                continue
+            value = coerce(value)
+            if value is not None:
+                out[field] = value
+                sources[field] = f"{view}.{key}"
+                break
+    out["sources"] = sources
+    out["warnings"] = warnings
+    out["parse_ms"] = round((time.perf_counter() - t0) * 1000, 3)
     return out
 
 def _extract_inputs(event) -> Tuple[List[str], List[str], str, Optional[str]]:
+    """DÖNÜŞ: (image_uris[], audio_uris[], user_input, media_type_hint) — bkz. parse_event_inputs"""
+    parsed = parse_event_inputs(event)
+    return (parsed["image_path"] or [], parsed["audio_path"] or [], parsed["user_input"] or "",
+            parsed["mediaType"])
+
+# ----------------- result cache -----------------
+class _MemoryLRU:
+    """Thread-safe LRU; modül seviyesinde yaşadığı için sıcak Lambda çağrıları arasında korunur."""
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+            return item
+
+    def put(self, key: str, ts: float, value: str) -> None:
+        with self._lock:
+            self._data[key] = (ts, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+class _DirStore:
+    """Yerel dizin katmanı: anahtar başına bir JSON; toplam boyut max_bytes'ı aşınca en eski erişilen silinir."""
+    def __init__(self, root: str, max_bytes: int = RESULT_CACHE_DIR_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                doc = json.load(f)
+            os.utime(path)  # mtime ~ son erişim (LRU tahliyesi için)
+            return doc["t"], doc["v"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, ts: float, value: str) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"t": ts, "v": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._evict()
+
+    def discard(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+                total -= size
+
+class _S3Store:
+    """S3 katmanı: s3://bucket/prefix/<anahtar>.json. Boyut tahliyesi bucket lifecycle kuralına bırakılır."""
+    def __init__(self, s3_uri: str):
+        self.bucket, self.prefix = _parse_s3_from_uri(s3_uri)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix.rstrip('/')}/{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            obj = s3.get_object(Bucket=self.bucket, Key=self._key(key))
+            doc = json.loads(obj["Body"].read())
+            return doc["t"], doc["v"]
+        except Exception:
+            return None
+
+    def put(self, key: str, ts: float, value: str) -> None:
+        body = json.dumps({"t": ts, "v": value}, ensure_ascii=False).encode("utf-8")
+        s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=body, ContentType="application/json")
+
+    def discard(self, key: str) -> None:
+        try:
+            s3.delete_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception:
+            pass
+
+class ResultCache:
     """
-    DÖNÜŞ: (image_uris[], audio_uris[], user_input, media_type_hint)
-    Öncelik: Flow 'data' nesnesi -> event alanları -> S3 event -> node tekil girdiler
-    """
-    # 0) Flow 'data' nesnesi
-    doc = _pluck_flow_data(event) or {}
-    imgs: List[str] = []
-    auds: List[str] = []
-    user_input = doc.get("user_input") or ""
-    media_hint = doc.get("mediaType")
-
-    # 1) doc içindeki listeler
-    image_path = doc.get("image_path")
-    audio_path = doc.get("audio_path")
-    if isinstance(image_path, list): imgs = image_path
-    elif isinstance(image_path, str): imgs = [image_path]
-    if isinstance(audio_path, list): auds = audio_path
-    elif isinstance(audio_path, str): auds = [audio_path]
-
-    # 2) top-level fallback (Lambda konsol testi vs.)
-    if not user_input:
-        user_input = event.get("user_input") or event.get("message") or event.get("prompt") or ""
-    media_hint = media_hint or event.get("mediaType")
-    if not imgs:
-        ip = event.get("image_path")
-        if isinstance(ip, list): imgs = ip
-        elif isinstance(ip, str): imgs = [ip]
-    if not auds:
-        ap = event.get("audio_path")
-        if isinstance(ap, list): auds = ap
-        elif isinstance(ap, str): auds = [ap]
-
-    # 3) single uri'lar
-    s3_uri = event.get("s3Uri") or event.get("s3_uri")
-    audio_uri = event.get("audioUri") or event.get("audio_uri")
-    if s3_uri and not imgs: imgs = [s3_uri]
-    if audio_uri and not auds: auds = [audio_uri]
-
-    # 4) S3 event
-    if not imgs:
-        rec_uris = _extract_from_s3_event(event)
-        if rec_uris:
-            imgs = rec_uris
-
-    # 5) node tekil girdiler (tam yedek)
-    if not imgs or not auds or not user_input or not media_hint:
-        node_vals = _extract_from_flow_node(event)
-        if not imgs and node_vals.get("image_path"): imgs = node_vals["image_path"]
-        if not auds and node_vals.get("audio_path"): auds = node_vals["audio_path"]
-        if not user_input and node_vals.get("user_input"): user_input = node_vals["user_input"]
-        if not media_hint and node_vals.get("mediaType"): media_hint = node_vals["mediaType"]
-
-    return imgs, auds, user_input, media_hint
+    İki katmanlı önbellek: sıcak in-memory LRU + isteğe bağlı kalıcı katman
+    (get/put/discard sağlayan herhangi bir nesne; _DirStore veya _S3Store).
+    Kalıcı katman hataları analizi bozmaz, sadece ıska sayılır.
+    """
+    def __init__(self, ttl_sec: float = RESULT_CACHE_TTL_SEC, max_items: int = RESULT_CACHE_MAX_ITEMS,
+                 persistent=None):
+        self.ttl_sec = ttl_sec
+        self.memory = _MemoryLRU(max_items)
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _fresh(self, item: Optional[Tuple[float, str]]) -> bool:
+        return item is not None and time.time() - item[0] <= self.ttl_sec
+
+    def get(self, key: str) -> Tuple[Optional[str], str]:
+        """DÖNÜŞ: (değer | None, "memory" | "persistent" | "miss")"""
+        item = self.memory.get(key)
+        if self._fresh(item):
+            self._count("memory_hits")
+            return item[1], "memory"
+        if item is not None:
+            self.memory.discard(key)
+        if self.persistent is not None:
+            try:
+                item = self.persistent.get(key)
+            except Exception:
+                item = None
+            if self._fresh(item):
+                self.memory.put(key, item[0], item[1])
+                self._count("persistent_hits")
+                return item[1], "persistent"
+            if item is not None:
+                self.persistent.discard(key)
+        self._count("misses")
+        return None, "miss"
+
+    def put(self, key: str, value: str) -> None:
+        ts = time.time()
+        self.memory.put(key, ts, value)
+        if self.persistent is not None:
+            try:
+                self.persistent.put(key, ts, value)
+            except Exception as e:
+                print(f"result cache persistent put failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        lookups = sum(out.values())
+        out["hit_rate"] = round((lookups - out["misses"]) / lookups, 3) if lookups else 0.0
+        return out
+
+def _build_persistent_tier():
+    if RESULT_CACHE_S3_URI:
+        return _S3Store(RESULT_CACHE_S3_URI)
+    if RESULT_CACHE_DIR:
+        return _DirStore(RESULT_CACHE_DIR)
+    return None
+
+_PERSISTENT_TIER = _build_persistent_tier()
+IMAGE_RESULT_CACHE = ResultCache(persistent=_PERSISTENT_TIER)
+# (bucket, key, ETag) -> içerik sha256; aynı nesne için indirmeyi atlamayı sağlar
+S3_ETAG_INDEX = ResultCache(persistent=_PERSISTENT_TIER)
+TRANSCRIPT_CACHE = ResultCache(persistent=_PERSISTENT_TIER)
+
+def _image_cache_key(content_sha256: str, prompt: str = ANALYSIS_PROMPT) -> str:
+    """Görsel içeriği + analiz sonucunu etkileyen tüm ayarlar (model, prompt, max_tokens)."""
+    h = hashlib.sha256()
+    for part in (content_sha256, MODEL_ID, prompt, str(MAX_TOKENS), _preprocess_signature()):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _etag_index_key(bucket: str, key: str, etag: str) -> str:
+    return hashlib.sha256(f"etag\0{bucket}\0{key}\0{etag}".encode("utf-8")).hexdigest()
+
+def _transcript_cache_key(etag: str, size: Optional[int]) -> str:
+    """Ses içeriği (ETag + boyut) + Transcribe ayarları; bucket/key'den bağımsızdır."""
+    return hashlib.sha256(f"transcript\0{etag}\0{size}\0{TRANSCRIBE_SETTINGS}".encode("utf-8")).hexdigest()
 
 # ----------------- image pipeline -----------------
-def _read_image_as_b64(s3_uri: str) -> Dict[str, Any]:
+def _head_object(s3_uri: str) -> Dict[str, Any]:
+    """Gövdeyi indirmeden ETag/boyut bilgisi."""
+    bkt, key = _parse_s3_from_uri(s3_uri)
+    with span("s3.head"):
+        head = s3.head_object(Bucket=bkt, Key=key)
+    return {"bucket": bkt, "key": key, "etag": head.get("ETag", "").strip('"'), "size": head.get("ContentLength")}
+
+def _preprocess_signature() -> str:
+    """Ön işleme ayarları analiz sonucunu etkiler; önbellek anahtarına girer."""
+    if _pil()[0] is None:
+        return "raw"
+    return f"pil:{IMAGE_MAX_EDGE_PX}:{IMAGE_TARGET_BYTES}:{','.join(map(str, IMAGE_JPEG_QUALITIES))}"
+
+def _flatten_to_rgb(img):
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        bg = _pil()[0].new("RGB", rgba.size, "white")
+        bg.paste(rgba, mask=rgba.split()[-1])
+        return bg
+    return img.convert("RGB")
+
+def _preprocess_image(raw: bytes, mime: str) -> Tuple[bytes, str, bool]:
+    """
+    Bedrock'a gitmeden önce: EXIF yönünü uygular ve EXIF'i atar, uzun kenarı
+    IMAGE_MAX_EDGE_PX'e indirir, IMAGE_TARGET_BYTES bütçesine sığacak şekilde
+    yeniden sıkıştırır. Zaten sınırlar içindeyse ve EXIF yoksa ham bayt döner.
+    PNG (ekran görüntüsü) mümkünse PNG kalır; bütçeye sığmazsa JPEG'e çevrilir.
+    DÖNÜŞ: (bayt, mime, ön işlendi mi). Pillow yoksa, GIF'te ya da görsel açılamaz /
+    dönüştürülemezse (bozuk EXIF, yazılamayan mod) ham bayt ve False döner.
+    """
+    Image, ImageOps = _pil()
+    if Image is None or mime == "image/gif":
+        return raw, mime, False
+    try:
+        img = Image.open(io.BytesIO(raw))
+        img.load()
+        too_big = max(img.size) > IMAGE_MAX_EDGE_PX
+        if not too_big and not img.getexif() and len(raw) <= IMAGE_TARGET_BYTES:
+            return raw, mime, True
+        img = ImageOps.exif_transpose(img)
+        if too_big:
+            img.thumbnail((IMAGE_MAX_EDGE_PX, IMAGE_MAX_EDGE_PX), Image.LANCZOS)
+        if mime == "image/png":
+            buf = io.BytesIO()
+            img.save(buf, format="PNG", optimize=True)
+            if buf.tell() <= IMAGE_TARGET_BYTES:
+                return buf.getvalue(), "image/png", True
+        img = _flatten_to_rgb(img)
+        for quality in IMAGE_JPEG_QUALITIES:
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=quality, optimize=True)
+            if buf.tell() <= IMAGE_TARGET_BYTES:
+                break
+        return buf.getvalue(), "image/jpeg", True
+    except Exception as e:
+        print(f"image preprocess failed, sending raw bytes: {e}")
+        return raw, mime, False
+
+class _ByteBudget:
+    """Bir çağrıdaki toplam indirme bütçesi; thread-safe, indirmeden önce rezerve edilir."""
+    def __init__(self, limit: int = REQUEST_MAX_IMAGE_BYTES):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int, uri: str) -> None:
+        with self._lock:
+            if self.used + size > self.limit:
+                raise ValueError(f"request image byte limit exceeded ({self.used + size} > {self.limit}): {uri}")
+            self.used += size
+
+def _check_image_size(size: Optional[int], uri: str) -> None:
+    if size is not None and size > IMAGE_MAX_BYTES:
+        raise ValueError(f"image too large ({size} > {IMAGE_MAX_BYTES} bytes): {uri}")
+
+def _read_s3_body(obj: Dict[str, Any], uri: str) -> Tuple[bytearray, str]:
+    """
+    Gövdeyi S3_READ_CHUNK parçalarla, ContentLength kadar önceden ayrılmış tek bir
+    tampona okur ve sha256'yı okurken hesaplar. DÖNÜŞ: (ham bayt, sha256 hex)
+    """
+    size = obj.get("ContentLength")
+    _check_image_size(size, uri)
+    buf = bytearray(size) if size is not None else bytearray()
+    digest = hashlib.sha256()
+    body = obj["Body"]
+    pos = 0
+    while True:
+        chunk = body.read(S3_READ_CHUNK)
+        if not chunk:
+            break
+        end = pos + len(chunk)
+        _check_image_size(end, uri)
+        if size is not None and end <= size:
+            buf[pos:end] = chunk
+        else:
+            del buf[pos:]
+            buf += chunk
+        digest.update(chunk)
+        pos = end
+    del buf[pos:]
+    return buf, digest.hexdigest()
+
+def _read_image(s3_uri: str, media_type_hint: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Görseli indirir ve ön işler. base64'e burada çevrilmez; gövde istek anında
+    doğrudan bayt olarak kurulur (bkz. _build_request_body).
+    """
     bkt, key = _parse_s3_from_uri(s3_uri)
-    obj = s3.get_object(Bucket=bkt, Key=key)
-    img_b64 = base64.b64encode(obj["Body"].read()).decode("utf-8")
-    return {"bucket": bkt, "key": key, "b64": img_b64, "mime": _infer_media_type(key)}
+    with span("s3.get"):
+        obj = s3.get_object(Bucket=bkt, Key=key)
+        raw, sha256 = _read_s3_body(obj, s3_uri)
+    mime = _infer_media_type(key, media_type_hint, bytes(raw[:16]))
+    with span("image.preprocess"):
+        data, mime, preprocessed = _preprocess_image(raw, mime)
+    return {"bucket": bkt, "key": key, "data": data, "b64_len": _b64_len(len(data)), "mime": mime,
+            "sha256": sha256, "etag": obj.get("ETag", "").strip('"'),
+            "bytes_before": len(raw), "bytes_after": len(data), "preprocessed": preprocessed}
+
+def _b64_len(n: int) -> int:
+    return 4 * ((n + 2) // 3)
 
-def _invoke_claude(image_b64: str, mime: str) -> str:
-    body = {
+def _write_b64(out: bytearray, pos: int, data) -> int:
+    """data'yı B64_ENCODE_CHUNK'lık dilimlerle base64'leyip out[pos:]'a yazar; yeni konumu döndürür."""
+    view = memoryview(data)
+    for off in range(0, len(view), B64_ENCODE_CHUNK):
+        chunk = base64.b64encode(view[off:off + B64_ENCODE_CHUNK])
+        out[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+    return pos
+
+def _build_request_body(content: List[Dict[str, Any]], max_tokens: int) -> bytearray:
+    """
+    Anthropic mesaj gövdesini bayt olarak kurar. _image_block'ların ham baytı JSON'a
+    str olarak hiç girmez: yer tutucu ile serileştirilir, base64 doğrudan gövdeye yazılır.
+    Tepe bellek ~ ham görsel + gövde (≈1.33x), eskiden ≈4-5x.
+    """
+    images: List[Any] = []
+    blocks: List[Dict[str, Any]] = []
+    token = f"__img_{uuid.uuid4().hex}_"
+    for block in content:
+        if block.get("type") == "image" and "raw" in block:
+            blocks.append({"type": "image", "source": {"type": "base64", "media_type": block["mime"],
+                                                       "data": f"{token}{len(images)}"}})
+            images.append(block["raw"])
+        else:
+            blocks.append(block)
+    text = json.dumps({
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": MAX_TOKENS,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "source": {"type":"base64","media_type": mime,"data": image_b64}},
-                    {"type": "text", "text": ANALYSIS_PROMPT}
-                ]
-            }
-        ]
-    }
-    resp = bedrock.invoke_model(
-        modelId=MODEL_ID,
-        body=json.dumps(body),
-        accept="application/json",
-        contentType="application/json",
-    )
-    out = json.loads(resp["body"].read())
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": blocks}]
+    })
+    pieces: List[Any] = []
+    pos = 0
+    for i, data in enumerate(images):
+        marker = f"{token}{i}\""
+        idx = text.index(marker, pos)
+        pieces += [text[pos:idx].encode("utf-8"), data]
+        pos = idx + len(marker) - 1  # kapanış tırnağı metinde kalır
+    pieces.append(text[pos:].encode("utf-8"))
+    # Gövde tam boyutunda bir kez ayrılır; büyürken yeniden ayırma/kopya olmaz
+    out = bytearray(sum(len(p) if j % 2 == 0 else _b64_len(len(p)) for j, p in enumerate(pieces)))
+    pos = 0
+    for j, piece in enumerate(pieces):
+        if j % 2:
+            pos = _write_b64(out, pos, piece)
+        else:
+            out[pos:pos + len(piece)] = piece
+            pos += len(piece)
+    return out
+
+def _invoke_claude_content(content: List[Dict[str, Any]], max_tokens: int = MAX_TOKENS) -> str:
+    with span("bedrock.body"):
+        body = _build_request_body(content, max_tokens)
+    with span("bedrock.invoke"):
+        resp = _call_limited(
+            "bedrock", bedrock.invoke_model,
+            modelId=MODEL_ID,
+            body=body,
+            accept="application/json",
+            contentType="application/json",
+        )
+        out = json.loads(resp["body"].read())
     return "".join([b.get("text","") for b in out.get("content",[]) if b.get("type")=="text"]).strip()
 
-def process_images(image_uris: List[str], media_type_hint: Optional[str]) -> Dict[str, Any]:
+def _image_block(data, mime: str) -> Dict[str, Any]:
+    """Ham baytlı görsel bloğu; base64'e _build_request_body çevirir."""
+    return {"type": "image", "mime": mime, "raw": data}
+
+def _invoke_claude(data, mime: str) -> str:
+    return _invoke_claude_content([_image_block(data, mime), {"type": "text", "text": ANALYSIS_PROMPT}])
+
+_BATCH_HEADER_RE = re.compile(r"^\s*#{1,6}\s*image_(\d+)\s*:?\s*$", re.MULTILINE)
+
+def _split_batch_output(text: str, count: int) -> List[Optional[str]]:
+    """'### image_<n>' başlıklarına göre böler; bulunamayan görseller None döner."""
+    parts: List[Optional[str]] = [None] * count
+    headers = list(_BATCH_HEADER_RE.finditer(text))
+    for i, m in enumerate(headers):
+        n = int(m.group(1))
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        section = text[m.end():end].strip()
+        if 1 <= n <= count and section and parts[n - 1] is None:
+            parts[n - 1] = section
+    return parts
+
+def _invoke_claude_batch(metas: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """
+    Birden fazla görseli tek mesajda gönderir ve yanıtı görsel başına böler.
+    Yanıtta bölümü eksik kalan görseller None döner; çağıran onları tekil çağrı
+    (ANALYSIS_PROMPT) ile tamamlar.
+    """
+    content: List[Dict[str, Any]] = []
+    for j, meta in enumerate(metas, start=1):
+        content.append({"type": "text", "text": f"image_{j}:"})
+        content.append(_image_block(meta["data"], meta["mime"]))
+    content.append({"type": "text", "text": BATCH_ANALYSIS_PROMPT})
+    text = _invoke_claude_content(content, max_tokens=min(BATCH_MAX_TOKENS, MAX_TOKENS * len(metas)))
+    return _split_batch_output(text, len(metas))
+
+def _pack_batches(metas: List[Dict[str, Any]], max_images: int = BATCH_MAX_IMAGES,
+                  max_bytes: int = BATCH_MAX_B64_BYTES) -> List[List[int]]:
+    """Sırayı koruyarak görsel/bayt bütçesine sığan ardışık gruplar (indeks listeleri)."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+    for i, meta in enumerate(metas):
+        size = meta["b64_len"]
+        if current and (len(current) >= max_images or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+def _resolve_image(uri: str, media_type_hint: Optional[str], prompt: str = ANALYSIS_PROMPT,
+                   budget: Optional[_ByteBudget] = None
+                   ) -> Tuple[Optional[str], Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Model çağrısından önceki her şey. DÖNÜŞ: (önbellekteki metin | None, meta | None, bilgi)
+    bilgi["cache"]: "memory" | "persistent" | "miss"; gövde indirildiyse bilgi ayrıca
+    ön işleme öncesi/sonrası bayt sayılarını içerir.
+    Önce head_object ile ETag alınır; (bucket, key, ETag) daha önce görülmüş ve
+    sonucu önbellekteyse gövde hiç indirilmez. İndirilecekse boyutu IMAGE_MAX_BYTES
+    ve çağrının bütçesine (budget) göre indirmeden önce denetlenir.
+    """
+    head = _head_object(uri)
+    etag_key = _etag_index_key(head["bucket"], head["key"], head["etag"]) if head["etag"] else None
+    if etag_key:
+        content_sha256, _ = S3_ETAG_INDEX.get(etag_key)
+        if content_sha256:
+            cached, source = IMAGE_RESULT_CACHE.get(_image_cache_key(content_sha256, prompt))
+            if cached is not None:
+                return cached, None, {"cache": source}
+    _check_image_size(head["size"], uri)
+    if budget is not None:
+        budget.reserve(head["size"] or 0, uri)
+    meta = _read_image(uri, media_type_hint)
+    info = {k: meta[k] for k in ("bytes_before", "bytes_after", "mime", "preprocessed")}
+    if meta["etag"]:
+        # get_object'in döndürdüğü ETag kullanılır; head ile get arasında nesne değişmiş olabilir
+        S3_ETAG_INDEX.put(_etag_index_key(meta["bucket"], meta["key"], meta["etag"]), meta["sha256"])
+    meta["cache_key"] = _image_cache_key(meta["sha256"], prompt)
+    cached, source = IMAGE_RESULT_CACHE.get(meta["cache_key"])
+    info["cache"] = source
+    if cached is not None:
+        return cached, None, info
+    return None, meta, info
+
+def _analyze_image(uri: str, media_type_hint: Optional[str],
+                   budget: Optional[_ByteBudget] = None) -> Tuple[str, Dict[str, Any]]:
+    """DÖNÜŞ: (analiz metni, bilgi) — bkz. _resolve_image"""
+    cached, meta, info = _resolve_image(uri, media_type_hint, ANALYSIS_PROMPT, budget)
+    if cached is not None:
+        return cached, info
+    text = _invoke_claude(meta["data"], meta["mime"])
+    if text:
+        IMAGE_RESULT_CACHE.put(meta["cache_key"], text)
+    return text, info
+
+def _timed_call(fn, *args) -> Tuple[Any, Optional[Exception], float]:
+    """fn(*args) çalıştırır; (sonuç, hata, geçen_saniye) döndürür, hatayı yutmaz kaydeder."""
+    t0 = time.perf_counter()
+    try:
+        return fn(*args), None, time.perf_counter() - t0
+    except Exception as e:
+        return None, e, time.perf_counter() - t0
+
+def _analyze_images_batched(image_uris: List[str], media_type_hint: Optional[str],
+                            pool: ThreadPoolExecutor,
+                            budget: Optional[_ByteBudget] = None) -> List[Tuple[Any, Optional[Exception], float]]:
+    """
+    Önce tüm görselleri paralel çözer (önbellek/indirme/ön işleme), önbellekte
+    olmayanları bütçeye göre gruplayıp her grubu tek Bedrock çağrısıyla analiz eder.
+    Toplu yanıtta bölümü eksik kalan görseller havuzda tekil çağrıyla tamamlanır.
+    Öğe süresi = kendi hazırlık süresi + grubunun çağrı süresi (+ tekil çağrı süresi).
+    """
+    futures = [pool.submit(_timed_call, _resolve_image, uri, media_type_hint, BATCH_ANALYSIS_PROMPT, budget)
+               for uri in image_uris]
+    outcomes: List[Tuple[Any, Optional[Exception], float]] = []
+    pending: List[Tuple[int, Dict[str, Any], Dict[str, Any]]] = []  # (öğe indeksi, meta, bilgi)
+    for i, fut in enumerate(futures):
+        out, err, elapsed = fut.result()
+        if err is None and out[0] is None:
+            pending.append((i, out[1], out[2]))
+            outcomes.append((None, None, elapsed))
+        else:
+            outcomes.append(((out[0], out[2]) if err is None else None, err, elapsed))
+    batches = _pack_batches([meta for _, meta, _ in pending])
+    batch_futures = [(batch, pool.submit(_timed_call, _invoke_claude_batch, [pending[j][1] for j in batch]))
+                     for batch in batches]
+    fallbacks = []  # (pending indeksi, future): toplu yanıtta bölümü eksik kalanlar
+    for batch, fut in batch_futures:
+        texts, err, batch_elapsed = fut.result()
+        for pos, j in enumerate(batch):
+            i, meta, info = pending[j]
+            elapsed = outcomes[i][2] + batch_elapsed
+            if err is not None:
+                outcomes[i] = (None, err, elapsed)
+                continue
+            info["batch_size"] = len(batch)
+            text = texts[pos]
+            if text is None:
+                outcomes[i] = (None, None, elapsed)
+                fallbacks.append((j, pool.submit(_timed_call, _invoke_claude, meta["data"], meta["mime"])))
+                continue
+            if text:
+                IMAGE_RESULT_CACHE.put(meta["cache_key"], text)
+            outcomes[i] = ((text, info), None, elapsed)
+    for j, fut in fallbacks:
+        i, meta, info = pending[j]
+        text, err, fallback_elapsed = fut.result()
+        elapsed = outcomes[i][2] + fallback_elapsed
+        if err is not None:
+            outcomes[i] = (None, err, elapsed)
+            continue
+        # Tekil prompt'un sonucu tekil anahtara yazılır; toplu anahtar yalnızca toplu yanıt tutar
+        if text:
+            IMAGE_RESULT_CACHE.put(_image_cache_key(meta["sha256"], ANALYSIS_PROMPT), text)
+        outcomes[i] = ((text, info), None, elapsed)
+    return outcomes
+
+def process_images(image_uris: List[str], media_type_hint: Optional[str],
+                   max_workers: int = IMAGE_MAX_WORKERS, batch: bool = IMAGE_BATCH_MODE) -> Dict[str, Any]:
+    """
+    Görselleri sınırlı bir thread havuzunda paralel indirip analiz eder.
+    max_workers, Bedrock throttling'e takılmamak için uçuştaki çağrı sayısını sınırlar.
+    batch=True iken görseller BATCH_MAX_IMAGES / BATCH_MAX_B64_BYTES bütçesiyle tek
+    mesajlarda gruplanır ve yanıt image_N anahtarlarına geri bölünür.
+    Sonuç sırası (image_1..image_N) ve hata haritası seri sürümle aynıdır.
+    IMAGE_MAX_BYTES'ı ya da çağrı başına REQUEST_MAX_IMAGE_BYTES'ı aşan görseller
+    indirilmeden o görselin hatası olarak raporlanır.
+    """
     if not image_uris:
         return {"status": "no_image", "results": {}, "errors": None, "count": 0, "requested": 0}
     results_map: Dict[str, str] = {}
     errors: Dict[str, str] = {}
-    for idx, uri in enumerate(image_uris, start=1):
+    timings: Dict[str, float] = {}
+    cache = {"hits": 0, "misses": 0}
+    sizes: Dict[str, Dict[str, Any]] = {}
+    workers = max(1, min(max_workers, len(image_uris)))
+    budget = _ByteBudget()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if batch:
+            outcomes = _analyze_images_batched(image_uris, media_type_hint, pool, budget)
+        else:
+            futures = [pool.submit(_timed_call, _analyze_image, uri, media_type_hint, budget) for uri in image_uris]
+            outcomes = [fut.result() for fut in futures]
+    for idx, (uri, (out, err, elapsed)) in enumerate(zip(image_uris, outcomes), start=1):
         key_name = f"image_{idx}"
-        try:
-            meta = _read_image_as_b64(uri)
-            mime = media_type_hint or meta["mime"]
-            text = _invoke_claude(meta["b64"], mime)
+        timings[key_name] = round(elapsed, 3)
+        if err is not None:
+            errors[key_name] = f"{uri} -> {err}"
+        else:
+            text, info = out
+            cache["misses" if info["cache"] == "miss" else "hits"] += 1
+            if "bytes_before" in info:
+                sizes[key_name] = {k: info[k] for k in ("bytes_before", "bytes_after", "mime", "preprocessed")}
             results_map[key_name] = text or "(empty response)"
-        except Exception as e:
-            errors[key_name] = f"{uri} -> {e}"
-    return {"status": "ok" if results_map else "error", "results": results_map, "errors": errors or None,
-            "count": len(results_map), "requested": len(image_uris)}
+    out = {"status": "ok" if results_map else "error", "results": results_map, "errors": errors or None,
+           "count": len(results_map), "requested": len(image_uris), "timings": timings, "cache": cache,
+           "sizes": sizes}
+    if batch:
+        out["batched"] = True
+    return out
 
 # ----------------- audio pipeline (Transcribe) -----------------
 def _infer_audio_format(key: str) -> Optional[str]:
@@ -222,49 +1158,481 @@ def _infer_audio_format(key: str) -> Optional[str]:
         if key.endswith(ext): return fmt
     return None
 
-def _start_and_wait_transcribe(s3_uri: str) -> str:
-    job_name = f"flow-asr-{uuid.uuid4().hex[:12]}"
+def _deadline_from_context(context, cap_sec: float = TRANSCRIBE_WAIT_SEC) -> float:
+    """Ortak mutlak son tarih (time.time()): cap_sec ile Lambda'nın kalan süresinin küçüğü."""
+    budget = cap_sec
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    if callable(get_remaining):
+        budget = min(budget, get_remaining() / 1000.0 - LAMBDA_SAFETY_MARGIN_SEC)
+    return time.time() + max(0.0, budget)
+
+def _audio_cache_key(s3_uri: str) -> Optional[str]:
+    """head_object ile transkript önbellek anahtarı; ETag alınamazsa None (önbellek ve tekilleştirme yok)."""
+    try:
+        head = _head_object(s3_uri)
+    except Exception as e:
+        print(f"audio head failed, no dedup for {s3_uri}: {e}")
+        return None
+    return _transcript_cache_key(head["etag"], head["size"]) if head["etag"] else None
+
+def _start_transcribe(s3_uri: str, deadline: Optional[float] = None,
+                      cache_key: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    DÖNÜŞ: (job_name, attached). cache_key verilirse iş adı ondan türetilir; aynı adla
+    bir iş zaten varsa (ConflictException) yeni iş açılmaz, mevcut işe bağlanılır
+    (attached=True). Adı tutan iş FAILED ise silinip aynı adla yeniden başlatılır.
+    """
+    if cache_key:
+        job_name = f"{TRANSCRIBE_JOB_PREFIX}-{cache_key[:32]}"
+    else:
+        job_name = f"{TRANSCRIBE_JOB_PREFIX}-{uuid.uuid4().hex[:12]}"
     media_fmt = _infer_audio_format(s3_uri)
     params = {"TranscriptionJobName": job_name, "Media": {"MediaFileUri": s3_uri}, "IdentifyLanguage": True}
     if media_fmt: params["MediaFormat"] = media_fmt
-    transcribe.start_transcription_job(**params)
-    deadline = time.time() + TRANSCRIBE_WAIT_SEC
-    while time.time() < deadline:
-        job = transcribe.get_transcription_job(TranscriptionJobName=job_name)
-        status = job["TranscriptionJob"]["TranscriptionJobStatus"]
-        if status == "COMPLETED":
-            uri = job["TranscriptionJob"]["Transcript"]["TranscriptFileUri"]
-            with urllib.request.urlopen(uri) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
+    for _ in range(2):
+        try:
+            with span("transcribe.start"):
+                _call_limited("transcribe", transcribe.start_transcription_job, deadline=deadline, **params)
+            return job_name, False
+        except Exception as e:
+            if not cache_key or _error_code(e) != "ConflictException":
+                raise
+        with span("transcribe.poll"):
+            job = _call_limited("transcribe", transcribe.get_transcription_job, deadline=deadline,
+                                TranscriptionJobName=job_name)["TranscriptionJob"]
+        if job["TranscriptionJobStatus"] != "FAILED":
+            return job_name, True
+        _call_limited("transcribe", transcribe.delete_transcription_job, deadline=deadline,
+                      TranscriptionJobName=job_name)
+    raise RuntimeError(f"Transcribe job {job_name} keeps failing; not restarted again")
+
+def _fetch_transcript(transcript_uri: str) -> str:
+    with span("transcribe.fetch"):
+        resp = get_http_pool().request("GET", transcript_uri)
+    if resp.status >= 400:
+        raise RuntimeError(f"transcript download failed: HTTP {resp.status}")
+    data = json.loads(resp.data.decode("utf-8"))
+    try:
+        return data["results"]["transcripts"][0]["transcript"]
+    except Exception:
+        return json.dumps(data, ensure_ascii=False)
+
+def _wait_transcribe_jobs(jobs: Dict[str, str], deadline: float) -> Tuple[Dict[str, str], Dict[str, Exception]]:
+    """
+    Tek bir poller ile tüm işleri izler: {anahtar: job_name} -> (transkriptler, hatalar).
+    Durum değişmedikçe poll aralığı üstel olarak TRANSCRIBE_POLL_SEC'e kadar büyür,
+    bir iş bittiğinde TRANSCRIBE_POLL_MIN_SEC'e döner. Son tarihte bitmeyenler
+    TimeoutError olarak döner; bitenlerin sonuçları korunur.
+    """
+    done: Dict[str, str] = {}
+    failed: Dict[str, Exception] = {}
+    pending = dict(jobs)
+    delay = TRANSCRIBE_POLL_MIN_SEC
+    while pending:
+        progressed = False
+        for key_name, job_name in list(pending.items()):
             try:
-                return data["results"]["transcripts"][0]["transcript"]
-            except Exception:
-                return json.dumps(data, ensure_ascii=False)
-        if status == "FAILED":
-            reason = job["TranscriptionJob"].get("FailureReason", "Unknown")
-            raise RuntimeError(f"Transcribe failed: {reason}")
-        time.sleep(TRANSCRIBE_POLL_SEC)
-    raise TimeoutError("Transcribe timed out; increase TRANSCRIBE_WAIT_SEC or Lambda timeout.")
-
-def process_audios(audio_uris: List[str]) -> Dict[str, Any]:
+                with span("transcribe.poll"):
+                    job = _call_limited("transcribe", transcribe.get_transcription_job, deadline=deadline,
+                                        TranscriptionJobName=job_name)["TranscriptionJob"]
+                status = job["TranscriptionJobStatus"]
+                if status == "COMPLETED":
+                    done[key_name] = _fetch_transcript(job["Transcript"]["TranscriptFileUri"])
+                elif status == "FAILED":
+                    raise RuntimeError(f"Transcribe failed: {job.get('FailureReason', 'Unknown')}")
+                else:
+                    continue
+            except Exception as e:
+                failed[key_name] = e
+            del pending[key_name]
+            progressed = True
+        if not pending:
+            break
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        delay = TRANSCRIBE_POLL_MIN_SEC if progressed else min(delay * TRANSCRIBE_POLL_BACKOFF, TRANSCRIBE_POLL_SEC)
+        time.sleep(min(delay, remaining))
+    for key_name, job_name in pending.items():
+        failed[key_name] = TimeoutError(f"Transcribe job {job_name} not finished before deadline; "
+                                        "increase TRANSCRIBE_WAIT_SEC or Lambda timeout.")
+    return done, failed
+
+def process_audios(audio_uris: List[str], deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Tüm Transcribe işlerini baştan başlatır, sonra tek poller ile bitenleri toplar.
+    deadline (time.time() cinsinden) tüm işler için ortaktır; süre dolarsa o ana kadar
+    biten transkriptler döner, kalanlar errors'a düşer.
+    Önce transkript önbelleğine bakılır (ETag + boyut); aynı içerik çağrıda birden çok
+    kez geçiyorsa tek iş başlatılır. cache: hits (önbellekten), misses (iş gerekti),
+    deduplicated (aynı çağrıdaki başka bir işi paylaştı), attached (başka bir isteğin
+    uçuştaki / bitmiş işine bağlandı).
+    """
     if not audio_uris:
         return {"status": "no_audio", "results": {}, "errors": None, "count": 0, "requested": 0}
+    deadline = deadline or time.time() + TRANSCRIBE_WAIT_SEC
     results_map: Dict[str, str] = {}
     errors: Dict[str, str] = {}
+    jobs: Dict[str, str] = {}
+    uri_by_key: Dict[str, str] = {}
+    texts: Dict[str, str] = {}
+    cache = {"hits": 0, "misses": 0, "deduplicated": 0, "attached": 0}
+    owner_by_cache_key: Dict[str, str] = {}   # cache_key -> işi başlatan audio_N
+    cache_key_by_owner: Dict[str, str] = {}
+    aliases: Dict[str, str] = {}              # audio_N -> aynı içerikli işin sahibi
     for idx, uri in enumerate(audio_uris, start=1):
         key_name = f"audio_{idx}"
+        uri_by_key[key_name] = uri
         try:
-            transcript = _start_and_wait_transcribe(uri)
-            results_map[key_name] = transcript or "(empty transcript)"
+            cache_key = _audio_cache_key(uri)
+            if cache_key:
+                cached, _ = TRANSCRIPT_CACHE.get(cache_key)
+                if cached is not None:
+                    texts[key_name] = cached
+                    cache["hits"] += 1
+                    continue
+                if cache_key in owner_by_cache_key:
+                    aliases[key_name] = owner_by_cache_key[cache_key]
+                    cache["deduplicated"] += 1
+                    continue
+            cache["misses"] += 1
+            jobs[key_name], attached = _start_transcribe(uri, deadline, cache_key)
+            cache["attached"] += attached
+            if cache_key:
+                owner_by_cache_key[cache_key] = key_name
+                cache_key_by_owner[key_name] = cache_key
         except Exception as e:
             errors[key_name] = f"{uri} -> {e}"
+    done, failed = _wait_transcribe_jobs(jobs, deadline)
+    for key_name, text in done.items():
+        texts[key_name] = text
+        if key_name in cache_key_by_owner:
+            TRANSCRIPT_CACHE.put(cache_key_by_owner[key_name], text)
+    for key_name, owner in aliases.items():
+        if owner in texts:
+            texts[key_name] = texts[owner]
+        elif owner in failed:
+            failed[key_name] = failed[owner]
+    for key_name in uri_by_key:
+        if key_name in texts:
+            results_map[key_name] = texts[key_name] or "(empty transcript)"
+        elif key_name in failed:
+            errors[key_name] = f"{uri_by_key[key_name]} -> {failed[key_name]}"
+    errors = {k: errors[k] for k in uri_by_key if k in errors}
     return {"status": "ok" if results_map else "error", "results": results_map, "errors": errors or None,
-            "count": len(results_map), "requested": len(audio_uris)}
+            "count": len(results_map), "requested": len(audio_uris), "cache": cache}
+
+# ----------------- orchestration -----------------
+def run_pipelines(images: List[str], audios: List[str], media_hint: Optional[str],
+                  deadline: Optional[float] = None,
+                  batch_images: bool = IMAGE_BATCH_MODE) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, float]]:
+    """
+    Görsel (Bedrock) ve ses (Transcribe) hatlarını birbirinden bağımsız olduğu için
+    aynı anda çalıştırır; toplam gecikme ikisinin toplamı değil, büyük olanı olur.
+    DÖNÜŞ: (image_out, audio_out, aşama_süreleri)
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        image_fut = pool.submit(_timed_call, process_images, images, media_hint, IMAGE_MAX_WORKERS, batch_images)
+        audio_fut = pool.submit(_timed_call, process_audios, audios, deadline)
+        image_out, image_err, image_sec = image_fut.result()
+        audio_out, audio_err, audio_sec = audio_fut.result()
+    if image_err is not None:
+        image_out = {"status": "error", "results": {}, "errors": {"images": str(image_err)},
+                     "count": 0, "requested": len(images)}
+    if audio_err is not None:
+        audio_out = {"status": "error", "results": {}, "errors": {"audios": str(audio_err)},
+                     "count": 0, "requested": len(audios)}
+    return image_out, audio_out, {"images": round(image_sec, 3), "audios": round(audio_sec, 3)}
+
+# ----------------- batch jobs -----------------
+class _DirJobStore:
+    """Yerel JSON dizini (S3 yerine geçen deneme deposu)."""
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def read(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, name: str, text: str) -> str:
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        return path
+
+class _S3JobStore:
+    def __init__(self, s3_uri: str):
+        self.bucket, self.prefix = _parse_s3_from_uri(s3_uri)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix.rstrip('/')}/{name}"
+
+    def read(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(s3.get_object(Bucket=self.bucket, Key=self._key(name))["Body"].read())
+        except Exception as e:
+            if _error_code(e) in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def write(self, name: str, text: str) -> str:
+        content_type = "application/x-ndjson" if name.endswith(".jsonl") else "application/json"
+        s3.put_object(Bucket=self.bucket, Key=self._key(name), Body=text.encode("utf-8"), ContentType=content_type)
+        return f"s3://{self.bucket}/{self._key(name)}"
+
+def _batch_store():
+    return _DirJobStore(BATCH_JOB_DIR) if BATCH_JOB_DIR else _S3JobStore(BATCH_JOB_S3_URI)
+
+def _write_json(store, name: str, doc: Dict[str, Any]) -> str:
+    return store.write(name, json.dumps(doc, ensure_ascii=False))
+
+def _list_batch_source(spec: Dict[str, Any]) -> List[str]:
+    """spec: {"prefix": "s3://b/images/"} | {"manifest": "s3://b/m.json"} | {"uris": [...]} -> sıralı URI'ler"""
+    if spec.get("uris"):
+        uris = _as_uri_list(spec["uris"]) or []
+    elif spec.get("manifest"):
+        bkt, key = _parse_s3_from_uri(spec["manifest"])
+        text = s3.get_object(Bucket=bkt, Key=key)["Body"].read().decode("utf-8")
+        try:
+            doc = json.loads(text)
+            uris = _as_uri_list(doc.get("uris", doc.get("image_path")) if isinstance(doc, dict) else doc) or []
+        except ValueError:
+            uris = [line.strip() for line in text.splitlines() if line.strip()]  # satır başına bir URI
+    elif spec.get("prefix"):
+        bkt, prefix = _parse_s3_from_uri(spec["prefix"], allow_empty_key=True)
+        uris = []
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bkt, Prefix=prefix):
+            uris += [f"s3://{bkt}/{obj['Key']}" for obj in page.get("Contents", [])
+                     if obj["Key"].lower().endswith(BATCH_IMAGE_EXTENSIONS)]
+    else:
+        raise ValueError("batch needs one of: prefix, manifest, uris")
+    return sorted(set(uris))
+
+def _batch_job_id(uris: List[str]) -> str:
+    """Aynı öğe kümesi aynı işe düşer: tekrar gönderim yeni iş açmaz."""
+    return "job-" + hashlib.sha256("\n".join(uris).encode("utf-8")).hexdigest()[:16]
+
+def _unit_name(job_id: str, unit: int, ext: str = "json") -> str:
+    folder = "units" if ext == "json" else "results"
+    return f"{job_id}/{folder}/{unit:05d}.{ext}"
+
+def _claim_unit(store, job_id: str, rec: Dict[str, Any], until: float) -> str:
+    """
+    Birimi `until`'e kadar kiralar; kira jetonu döner. Aynı birim aynı anda iki çağrıda
+    işlenmesin diye (en iyi çaba: S3'te kilit yok; çakışmada öğeler iki kez işlenir,
+    sonuçlar aynıdır ve çoğu sonuç önbelleğinden gelir).
+    """
+    rec.update(lease_until=until, lease_token=uuid.uuid4().hex)
+    _write_json(store, _unit_name(job_id, rec["unit"]), rec)
+    return rec["lease_token"]
+
+_function_timeouts: Dict[str, int] = {}
+
+def _function_timeout_sec(function_arn: str) -> int:
+    """Fonksiyonun yapılandırılmış zaman aşımı (sn); ARN başına bir kez sorulur."""
+    if function_arn not in _function_timeouts:
+        config = get_client("lambda").get_function_configuration(FunctionName=function_arn)
+        _function_timeouts[function_arn] = config["Timeout"]
+    return _function_timeouts[function_arn]
+
+def _dispatch_unit(store, job_id: str, rec: Dict[str, Any], context) -> bool:
+    """
+    Birimi aynı fonksiyonun asenkron (Event) çağrısına devreder; mümkün değilse False.
+    Fonksiyonun zaman aşımı BATCH_MIN_REMAINING_SEC'i karşılamıyorsa devredilen çağrı
+    hiçbir öğe işleyemez; fan-out reddedilir (ValueError).
+    """
+    function_arn = getattr(context, "invoked_function_arn", None)
+    if not (BATCH_FANOUT and function_arn):
+        return False
+    timeout = _function_timeout_sec(function_arn)
+    if timeout - LAMBDA_SAFETY_MARGIN_SEC <= BATCH_MIN_REMAINING_SEC:
+        raise ValueError(f"function timeout {timeout}s leaves no room for a batch unit "
+                         f"(needs > {BATCH_MIN_REMAINING_SEC + LAMBDA_SAFETY_MARGIN_SEC}s)")
+    token = _claim_unit(store, job_id, rec, time.time() + BATCH_DISPATCH_LEASE_SEC)
+    payload = {"batch": {"job_id": job_id, "unit": rec["unit"], "lease_token": token}}
+    get_client("lambda").invoke(FunctionName=function_arn, InvocationType="Event",
+                                Payload=json.dumps(payload).encode("utf-8"))
+    return True
+
+def submit_batch_job(spec: Dict[str, Any], context=None) -> Dict[str, Any]:
+    """
+    Kaynağı listeler, BATCH_UNIT_SIZE'lık birimlere böler ve iş kaydını yazar.
+    İş zaten varsa (aynı öğeler ya da aynı job_id) yeniden oluşturulmaz; bitmemiş
+    ve kiralaması düşmüş birimler yeniden başlatılır (kaldığı yerden devam).
+    Fan-out mümkünse her birim ayrı bir Lambda çağrısında, değilse bu çağrıda
+    süre yettiği kadar sırayla işlenir.
+    """
+    store = _batch_store()
+    uris = _list_batch_source(spec)
+    if not uris:
+        return {"status": "empty", "items": 0}
+    job_id = spec.get("job_id") or _batch_job_id(uris)
+    job = store.read(f"{job_id}/job.json")
+    if job is None:
+        units = [uris[i:i + BATCH_UNIT_SIZE] for i in range(0, len(uris), BATCH_UNIT_SIZE)]
+        for n, unit_uris in enumerate(units):
+            _write_json(store, _unit_name(job_id, n), {
+                "unit": n, "status": "pending", "lease_until": 0, "started_at": None, "finished_at": None,
+                "items": [{"uri": uri, "state": "pending", "attempts": 0} for uri in unit_uris]})
+        job = {"job_id": job_id, "created_at": time.time(), "items": len(uris), "units": len(units),
+               "unit_size": BATCH_UNIT_SIZE,
+               "source": {k: spec[k] for k in ("prefix", "manifest") if spec.get(k)} or {"uris": len(uris)}}
+        _write_json(store, f"{job_id}/job.json", job)  # en son: iş kaydı varsa birimler eksiksizdir
+    deadline = _deadline_from_context(context, LAMBDA_MAX_SEC)
+    now = time.time()
+    for n in range(job["units"]):
+        unit = store.read(_unit_name(job_id, n))
+        if unit is None or unit["status"] == "done" or unit["lease_until"] > now:
+            continue
+        if not _dispatch_unit(store, job_id, unit, context):
+            if deadline - time.time() < BATCH_MIN_REMAINING_SEC:
+                break
+            run_batch_unit(job_id, n, context)
+    return batch_job_status(job_id)
+
+def run_batch_unit(job_id: str, unit: int, context=None, lease_token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Bir birimin bekleyen öğelerini işler. Her BATCH_CHECKPOINT_ITEMS öğede durum ve
+    JSONL sonuç dosyası yeniden yazılır; yeniden denemede biten öğeler atlanır.
+    Süre azalırsa birim kendini yeni bir çağrıya devreder; bu çağrıda hiç öğe
+    işlenemediyse devretmez, birim pending kalır.
+    """
+    store = _batch_store()
+    name = _unit_name(job_id, unit)
+    rec = store.read(name)
+    if rec is None:
+        raise ValueError(f"unknown batch unit {job_id}/{unit}")
+    deadline = _deadline_from_context(context, LAMBDA_MAX_SEC)
+    leased_to_other = rec["lease_until"] > time.time() and rec.get("lease_token") != lease_token
+    if rec["status"] == "done" or leased_to_other:
+        return {"job_id": job_id, "unit": unit, "status": rec["status"], "skipped": True}
+    rec.update(status="running", started_at=rec["started_at"] or time.time())
+    _claim_unit(store, job_id, rec, deadline)
+    processed = 0
+    while True:
+        # Hatalı öğeler deneme hakkı bitene kadar sıraya geri girer
+        chunk = [item for item in rec["items"]
+                 if item["state"] != "done" and item["attempts"] < BATCH_ITEM_MAX_ATTEMPTS][:BATCH_CHECKPOINT_ITEMS]
+        if not chunk or deadline - time.time() < BATCH_MIN_REMAINING_SEC:
+            break
+        out = process_images([item["uri"] for item in chunk], None)
+        for idx, item in enumerate(chunk, start=1):
+            key_name = f"image_{idx}"
+            item["attempts"] += 1
+            if key_name in out["results"]:
+                item.update(state="done", text=out["results"][key_name], error=None)
+            else:
+                item.update(state="error", error=(out["errors"] or {}).get(key_name, "unknown error"))
+        processed += len(chunk)
+        lines = [json.dumps({k: item.get(k) for k in ("uri", "state", "text", "error")}, ensure_ascii=False)
+                 for item in rec["items"] if item["state"] != "pending"]
+        rec["results_uri"] = store.write(_unit_name(job_id, unit, "jsonl"), "\n".join(lines) + "\n")
+        _write_json(store, name, rec)
+    retryable = [item for item in rec["items"]
+                 if item["state"] != "done" and item["attempts"] < BATCH_ITEM_MAX_ATTEMPTS]
+    rec["lease_until"] = 0
+    if retryable:
+        rec["status"] = "pending"
+        _write_json(store, name, rec)
+        # İlerleme yoksa devretmek aynı durumu yeni çağrıda tekrarlar (sonsuz zincir);
+        # birim bekler, işin yeniden gönderimi (submit) onu tekrar başlatır.
+        if processed:
+            _dispatch_unit(store, job_id, rec, context)
+    else:
+        rec.update(status="done", finished_at=time.time())
+        _write_json(store, name, rec)
+    return {"job_id": job_id, "unit": unit, "status": rec["status"], "processed": processed,
+            "remaining": len(retryable)}
+
+def batch_job_status(job_id: str) -> Dict[str, Any]:
+    """Birim kayıtlarından toplu durum ve throughput (biten öğe / iş başından beri geçen süre)."""
+    store = _batch_store()
+    job = store.read(f"{job_id}/job.json")
+    if job is None:
+        return {"job_id": job_id, "status": "unknown"}
+    counts = {"pending": 0, "done": 0, "error": 0}
+    units = {"pending": 0, "running": 0, "done": 0}
+    results, last_finished = [], None
+    for n in range(job["units"]):
+        rec = store.read(_unit_name(job_id, n)) or {"status": "pending", "items": []}
+        units[rec["status"]] = units.get(rec["status"], 0) + 1
+        for item in rec["items"]:
+            counts[item["state"]] += 1
+        if rec.get("results_uri"):
+            results.append(rec["results_uri"])
+        if rec.get("finished_at"):
+            last_finished = max(last_finished or 0, rec["finished_at"])
+    finished = units["done"] == job["units"]
+    elapsed = ((last_finished if finished else time.time()) or time.time()) - job["created_at"]
+    settled = counts["done"] + counts["error"]
+    return {"job_id": job_id, "status": "done" if finished else "running", "items": job["items"],
+            "counts": counts, "units": units, "results": results, "elapsed_sec": round(elapsed, 1),
+            "items_per_sec": round(settled / elapsed, 3) if elapsed > 0 else None}
+
+def handle_batch(spec: Dict[str, Any], context=None) -> Dict[str, Any]:
+    """
+    {"batch": {...}} olayları:
+      {"prefix"|"manifest"|"uris": ..., ["job_id"]}  -> iş gönder / devam ettir
+      {"job_id": ..., "unit": n}                    -> tek birimi işle (fan-out çağrısı)
+      {"job_id": ...}                               -> durum
+    """
+    if spec.get("job_id") and "unit" in spec:
+        return run_batch_unit(spec["job_id"], int(spec["unit"]), context, spec.get("lease_token"))
+    if any(spec.get(k) for k in ("prefix", "manifest", "uris")):
+        return submit_batch_job(spec, context)
+    if spec.get("job_id"):
+        return batch_job_status(spec["job_id"])
+    raise ValueError("batch needs prefix, manifest, uris or job_id")
 
 # ----------------- handler -----------------
 def lambda_handler(event, context):
-    print(f"event: {event}")
-    images, audios, user_input, media_hint = _extract_inputs(event)
-    image_out = process_images(images, media_hint)
-    audio_out = process_audios(audios)
-    return {"images": image_out, "audios": audio_out, "user_input": user_input}
\ No newline at end of file
+    global _invocation_deadline
+    if isinstance(event, dict) and event.get("warmup"):
+        return {"warmup": warm_up()}
+    if isinstance(event, dict) and isinstance(event.get("batch"), dict):
+        _invocation_deadline = _deadline_from_context(context, LAMBDA_MAX_SEC)
+        try:
+            return handle_batch(event["batch"], context)
+        finally:
+            _invocation_deadline = None
+    t0 = time.perf_counter()
+    parsed = parse_event_inputs(event)
+    images, audios = parsed["image_path"] or [], parsed["audio_path"] or []
+    user_input, media_hint = parsed["user_input"] or "", parsed["mediaType"]
+    batch_images = IMAGE_BATCH_MODE if parsed["batch_images"] is None else parsed["batch_images"]
+    trace = _start_trace(parsed["correlation_id"])
+    correlation_id = trace.correlation_id if trace else parsed["correlation_id"]
+    # Olayın kendisi (kullanıcı metni, URI'ler) loglanmaz; yalnızca özet
+    print(json.dumps({"correlation_id": correlation_id, "images": len(images), "audios": len(audios),
+                      "user_input_chars": len(user_input), "sources": parsed["sources"]}))
+    extract_sec = time.perf_counter() - t0
+    if trace:
+        trace.record("extract", extract_sec * 1000)
+    # Bedrock/Transcribe beklemeleri ve yeniden denemeleri Lambda'nın kalan süresini aşmaz
+    _invocation_deadline = _deadline_from_context(context, LAMBDA_MAX_SEC)
+    try:
+        image_out, audio_out, stage_timings = run_pipelines(images, audios, media_hint,
+                                                            _deadline_from_context(context), batch_images)
+    finally:
+        _invocation_deadline = None
+        trace_out = _finish_trace(trace)
+    timings = {"extract": round(extract_sec, 3), **stage_timings, "total": round(time.perf_counter() - t0, 3)}
+    if audios:
+        print(json.dumps({"correlation_id": correlation_id, "http": http_stats()}))
+    inputs = {"sources": parsed["sources"], "parse_ms": parsed["parse_ms"], "warnings": parsed["warnings"] or None}
+    out = {"images": image_out, "audios": audio_out, "user_input": user_input, "timings": timings, "inputs": inputs,
+           "cache": {"image_results": IMAGE_RESULT_CACHE.stats(), "s3_etag_index": S3_ETAG_INDEX.stats(),
+                     "transcripts": TRANSCRIPT_CACHE.stats()},
+           "rate_limits": rate_limit_stats(), "http": http_stats(), "correlation_id": correlation_id}
+    if trace_out:
+        out["trace"] = trace_out
+    return out
@@ -0,0 +1,217 @@
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+import streamlit as st
+
+# Answers are only valid for the knowledge base they were generated from; its version
+# is re-read at most this often and a new version (e.g. after re-ingesting the
+# legislation) clears the cache.
+KB_VERSION_TTL_SEC = int(os.getenv("KB_VERSION_TTL_SEC", "300"))
+ANSWER_CACHE_TTL_SEC = int(os.getenv("ANSWER_CACHE_TTL_SEC", str(24 * 3600)))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9"))  # cosine similarity
+ANSWER_CACHE_MAX_ITEMS = 1000
+EMBEDDING_DIM = 2048
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_NUMBER_RE = re.compile(r"\d+")
+# Words that never change what is being asked: greetings, politeness, question
+# particles and generic question words. Anything else (months, tax types, verbs with
+# their negation suffix, "değil", "nasıl", "neden", ...) is a content word and must
+# be identical for a similarity hit.
+STOPWORDS = frozenset({
+    "merhaba", "selam", "iyi", "günler", "lütfen", "rica", "ederim", "teşekkürler", "teşekkür", "acaba",
+    "mı", "mi", "mu", "mü", "mıdır", "midir", "mudur", "müdür", "misiniz", "mısınız", "musunuz", "müsünüz",
+    "nedir", "nelerdir", "neler", "ne", "hakkında", "bilgi", "verir", "verebilir", "bana", "bize",
+    "bir", "bu", "şu", "o", "da", "de", "ki", "ise", "ile", "ve", "için", "olarak",
+})
+
+def normalize_question(text: str) -> str:
+    """
+    Turkish-aware casefold (I -> ı, İ -> i), punctuation removed and whitespace
+    collapsed, so "Gelirin unsurları nelerdir?" and "gelirin  unsurları nelerdir"
+    are the same question.
+    """
+    text = unicodedata.normalize("NFC", text).replace("I", "ı").replace("İ", "i").lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return " ".join(text.split())
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> Dict[int, float]:
+    """
+    Local, dependency-free embedding: hashed word unigrams plus character
+    trigrams of the normalized question without STOPWORDS, L2-normalized
+    (sparse {index: weight}). Trigrams make it tolerant to Turkish suffixes and typos.
+    """
+    norm = " ".join(word for word in normalize_question(text).split() if word not in STOPWORDS)
+    features = norm.split()
+    padded = f" {norm} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vec: Dict[int, float] = {}
+    for feature in features:
+        idx = zlib.crc32(feature.encode("utf-8")) % dim
+        vec[idx] = vec.get(idx, 0.0) + 1.0
+    length = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {k: v / length for k, v in vec.items()}
+
+def _numbers(norm: str) -> Tuple[str, ...]:
+    """Numbers in order; rates, years and amounts must match exactly for a similarity hit."""
+    return tuple(_NUMBER_RE.findall(norm))
+
+def _content_words(norm: str) -> FrozenSet[str]:
+    """Words of a normalized question minus STOPWORDS; must be equal for a similarity hit."""
+    return frozenset(word for word in norm.split() if word not in STOPWORDS)
+
+def _signature(norm: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """(numbers, content words): only questions with the same signature can be similar hits."""
+    return _numbers(norm), _content_words(norm)
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+class AnswerCache:
+    """
+    Answers to text-only questions, looked up by exact normalized match first and
+    then by nearest neighbour over question embeddings above a similarity threshold,
+    only among questions with the same content words (see STOPWORDS) and numbers:
+    a different month, tax type or negated verb is a different question, however
+    close the embeddings are. Entries are indexed by that signature, so a lookup
+    only compares against its own bucket.
+    Entries expire after ttl_sec; the whole cache is cleared when kb_version_fn
+    (re-read every kb_version_ttl_sec) reports a new knowledge-base version.
+    """
+
+    def __init__(self, kb_version_fn: Optional[Callable[[], str]] = None,
+                 kb_version_ttl_sec: float = KB_VERSION_TTL_SEC, ttl_sec: float = ANSWER_CACHE_TTL_SEC,
+                 threshold: float = ANSWER_CACHE_THRESHOLD, max_items: int = ANSWER_CACHE_MAX_ITEMS,
+                 embed_fn: Callable[[str], Dict[int, float]] = embed):
+        self.kb_version_fn = kb_version_fn
+        self.kb_version_ttl_sec = kb_version_ttl_sec
+        self.kb_version: Optional[str] = None
+        self._kb_checked_at = 0.0
+        self.ttl_sec = ttl_sec
+        self.threshold = threshold
+        self.max_items = max_items
+        self.embed_fn = embed_fn
+        # normalized question -> (vector, answer, created_at, signature), in LRU order
+        self._entries: "OrderedDict[str, Tuple[Dict[int, float], str, float, tuple]]" = OrderedDict()
+        # signature -> normalized questions with that signature
+        self._buckets: Dict[tuple, Dict[str, None]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "invalidations": 0}
+
+    def _valid(self, entry) -> bool:
+        return time.time() - entry[2] <= self.ttl_sec
+
+    def _remove(self, key: str) -> None:
+        signature = self._entries.pop(key)[3]
+        bucket = self._buckets[signature]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[signature]
+
+    def set_kb_version(self, version: str) -> None:
+        """Records the knowledge-base version; answers from any other version are dropped."""
+        with self._lock:
+            if version == self.kb_version:
+                return
+            if self._entries:
+                self._entries.clear()
+                self._buckets.clear()
+                self._stats["invalidations"] += 1
+            self.kb_version = version
+
+    def _refresh_kb_version(self) -> None:
+        if self.kb_version_fn is None:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._kb_checked_at < self.kb_version_ttl_sec:
+                return
+            # One caller re-reads; the others go on with the current version meanwhile
+            self._kb_checked_at = now
+        try:
+            version = str(self.kb_version_fn())
+        except Exception as e:
+            print(f"Answer cache: knowledge-base version check failed: {e}")
+            return
+        self.set_kb_version(version)
+
+    def lookup(self, question: str) -> Optional[Tuple[str, float]]:
+        """(answer, similarity) or None."""
+        key = normalize_question(question)
+        if not key:
+            return None
+        self._refresh_kb_version()
+        vec = self.embed_fn(question)
+        signature = _signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._valid(entry):
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry[1], 1.0
+            best_key, best_score = None, 0.0
+            for other_key in list(self._buckets.get(signature, ())):
+                other = self._entries[other_key]
+                if not self._valid(other):
+                    self._remove(other_key)
+                    continue
+                score = _cosine(vec, other[0])
+                if score > best_score:
+                    best_key, best_score = other_key, score
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self._stats["similar_hits"] += 1
+                return self._entries[best_key][1], best_score
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, question: str, answer: str) -> None:
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        self._refresh_kb_version()
+        signature = _signature(key)
+        entry = (self.embed_fn(question), answer, time.time(), signature)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._buckets.setdefault(signature, {})[key] = None
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+
+    def prewarm(self, questions: Iterable[str], fetch: Callable[[str], str]) -> threading.Thread:
+        """Fetch and store answers for `questions` in a background thread."""
+        def _run():
+            for question in questions:
+                if self.lookup(question) is not None:
+                    continue
+                try:
+                    self.store(question, fetch(question))
+                except Exception as e:
+                    print(f"Answer cache prewarm failed for {question[:40]!r}: {e}")
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._entries)
+        lookups = out["exact_hits"] + out["similar_hits"] + out["misses"]
+        out["hit_rate"] = round((lookups - out["misses"]) / lookups, 3) if lookups else 0.0
+        return out
+
+@st.cache_resource
+def get_answer_cache(_kb_version_fn: Optional[Callable[[], str]] = None) -> AnswerCache:
+    """Process-wide cache shared by all sessions."""
+    return AnswerCache(kb_version_fn=_kb_version_fn)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import streamlit as st
+
+import config
+
+# How long a credential/bucket check is trusted before a background refresh
+AWS_STATUS_TTL_SEC = 300
+
+class AWSStatus:
+    """
+    Cached result of config.get_aws_account_info() and config.check_s3_access().
+    The first read checks synchronously; later reads return the last result
+    immediately and refresh it in a background thread once it is older than the TTL.
+    """
+
+    def __init__(self, bucket: str, ttl_sec: float = AWS_STATUS_TTL_SEC):
+        self.bucket = bucket
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked_at = 0.0
+        self._account_info = None
+        self._bucket_access = None
+
+    def _check(self) -> None:
+        account_info = config.get_aws_account_info()
+        bucket_access = config.check_s3_access(self.bucket)
+        with self._lock:
+            self._account_info = account_info
+            self._bucket_access = bucket_access
+            self._checked_at = time.time()
+            self._refreshing = False
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._check, daemon=True).start()
+
+    def get(self) -> dict:
+        """{"account_info": {...}, "bucket_access": (bool, str), "checked_at": float}"""
+        with self._lock:
+            known = self._bucket_access is not None
+            stale = time.time() - self._checked_at > self.ttl_sec
+        if not known:
+            self._check()
+        elif stale:
+            self._refresh_in_background()
+        with self._lock:
+            return {"account_info": self._account_info, "bucket_access": self._bucket_access,
+                    "checked_at": self._checked_at}
+
+    def invalidate(self) -> None:
+        """Forget the cached result (e.g. after an upload got AccessDenied); the next read re-checks."""
+        with self._lock:
+            self._account_info = None
+            self._bucket_access = None
+            self._checked_at = 0.0
+
+def get_aws_status(bucket: str = config.S3_RECORDING_BUCKET) -> AWSStatus:
+    """Per-session status object, so STS/S3 are not called on every rerun."""
+    key = f"aws_status:{bucket}"
+    if key not in st.session_state:
+        st.session_state[key] = AWSStatus(bucket)
+    return st.session_state[key]
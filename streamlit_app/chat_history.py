@@ -0,0 +1,99 @@
+import math
+import os
+from collections import deque
+from typing import Deque, List, Sequence
+
+import streamlit as st
+
+# Messages rendered in full on every rerun; older ones are compacted to a one-line
+# summary and shown page by page on request.
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "20"))
+# Compacted messages kept per session; older ones are dropped (only counted)
+CHAT_ARCHIVE_MAX = int(os.getenv("CHAT_ARCHIVE_MAX", "200"))
+CHAT_SUMMARY_CHARS = 160
+CHAT_PAGE_SIZE = 10
+# Answers of the window that get their audio player back on a rerun
+CHAT_AUDIO_WINDOW = 3
+CHAT_AUDIO_URL_EXPIRES_SEC = 3600
+
+def summarize(text: str, limit: int = CHAT_SUMMARY_CHARS) -> str:
+    """First line of the message, cut at a word boundary to at most `limit` characters."""
+    line = " ".join(text.strip().split("\n", 1)[0].split())
+    if len(line) <= limit:
+        return line
+    cut = line.rfind(" ", 0, limit - 1)
+    return line[:cut if cut > 0 else limit - 1] + "…"
+
+class ChatHistory:
+    """
+    Per-session chat log with bounded memory: the last `window` messages in
+    full, up to `archive_max` older ones as summaries. Audio is kept as
+    TTS-cache keys, never as bytes.
+    """
+
+    def __init__(self, window: int = CHAT_WINDOW, archive_max: int = CHAT_ARCHIVE_MAX):
+        self.window = max(1, window)
+        self.recent: Deque[dict] = deque()
+        self.archive: Deque[dict] = deque(maxlen=max(0, archive_max))
+        self.dropped = 0
+
+    def append(self, role: str, content: str, audio_keys: Sequence[str] = ()) -> dict:
+        message = {"role": role, "content": content, "audio": list(audio_keys)}
+        self.recent.append(message)
+        while len(self.recent) > self.window:
+            old = self.recent.popleft()
+            if len(self.archive) == self.archive.maxlen:
+                self.dropped += 1
+            if self.archive.maxlen:
+                # The summary is computed once here, not on every rerun
+                self.archive.append({"role": old["role"], "summary": summarize(old["content"])})
+        return message
+
+    def __len__(self) -> int:
+        return self.dropped + len(self.archive) + len(self.recent)
+
+    def pages(self) -> int:
+        return math.ceil(len(self.archive) / CHAT_PAGE_SIZE)
+
+    def page(self, number: int) -> List[dict]:
+        """Archived summaries on page `number` (1 = oldest)."""
+        start = (number - 1) * CHAT_PAGE_SIZE
+        return [self.archive[i] for i in range(start, min(start + CHAT_PAGE_SIZE, len(self.archive)))]
+
+def get_chat_history() -> ChatHistory:
+    """Per-session history; replaces the unbounded st.session_state.messages list."""
+    if "chat_history" not in st.session_state:
+        st.session_state["chat_history"] = ChatHistory()
+    return st.session_state["chat_history"]
+
+def _render_archive(history: ChatHistory) -> None:
+    with st.expander(f"Earlier messages ({len(history) - len(history.recent)})"):
+        if history.dropped:
+            st.caption(f"{history.dropped} oldest messages are no longer kept.")
+        pages = history.pages()
+        if not pages:
+            return
+        number = st.number_input("Page", min_value=1, max_value=pages, value=pages,
+                                 key="chat_history_page") if pages > 1 else 1
+        for message in history.page(int(number)):
+            label = "You" if message["role"] == "user" else "Assistant"
+            st.markdown(f"**{label}:** {message['summary']}")
+
+def render(history: ChatHistory, tts_cache=None) -> None:
+    """
+    Renders the window (plus one collapsed archive page), so the work per rerun
+    does not grow with the conversation. The last CHAT_AUDIO_WINDOW answers get
+    their player back, one per answer: a presigned S3 URL for a single-chunk
+    answer when the TTS cache has an S3 tier, otherwise the cached chunks joined.
+    """
+    if len(history) > len(history.recent):
+        _render_archive(history)
+    replay = [m for m in history.recent if m["audio"]][-CHAT_AUDIO_WINDOW:] if tts_cache is not None else []
+    replay_ids = {id(m) for m in replay}
+    for message in history.recent:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            if id(message) in replay_ids:
+                ref = tts_cache.answer_ref(message["audio"], CHAT_AUDIO_URL_EXPIRES_SEC)
+                if ref is not None:
+                    st.audio(ref, format="audio/mp3")
@@ -1,11 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Tuple
+from typing import Iterator, List, Optional, Tuple
+import io
 import os
+import threading
+import time
 import boto3
+import requests
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+import answer_cache
+import http_session
+import polly_text
+import rate_limit
+import tracing
+import tts_cache
+
 # API Configuration
 API_URL = "https://k6gnqai4bffo6n4ras6ixyckmq0cbbwy.lambda-url.eu-central-1.on.aws/"
+# Fill the answer cache with the sidebar examples when the app process starts
+PREWARM_EXAMPLE_ANSWERS = os.getenv("PREWARM_EXAMPLE_ANSWERS", "1") == "1"
+# SSM parameter holding the knowledge-base version; the ingestion job bumps it after
+# re-ingesting the legislation and the answer cache is cleared when it changes.
+KB_VERSION_PARAMETER = os.getenv("KB_VERSION_PARAMETER", "/gelir-vergisi/kb-version")
+
+EXAMPLE_QUESTIONS = [
+    "Gelirin unsurları nelerdir?",
+    "Merhaba, Ocak 2024 döneminde bazı faturalarımızda KDV oranını yanlışlıkla yüzde 20 yerine yüzde 10 uyguladığımızı fark ettik. Bu nedenle beyannamenin düzeltilmesini talep ediyoruz.",
+    "İç denetimde, 2024/Ocak dönemine ait bazı hizmet faturalarında KDV oranının hatalı uygulandığı tespit edilmiştir. Sorunun çözümü için referans alınması gereken mevzuatlar nelerdir?",
+]
 
 # S3 Settings
 S3_BUCKET = "gelir-vergisi "  # for outputs
@@ -13,6 +38,19 @@ S3_REGION = os.getenv("AWS_DEFAULT_REGION", "eu-central-1")
 S3_RECORDING_BUCKET = "gelir-vergisi"
 S3_AUDIO_PREFIX = "recordings/"
 S3_IMAGE_PREFIX = "images/"
+UPLOAD_MAX_WORKERS = 4  # files uploaded in parallel per chat turn
+# Browser uploads straight to S3 with presigned POSTs; the app server only sees s3:// URIs.
+# Needs a CORS rule on the bucket allowing POST from the app's origin.
+DIRECT_UPLOADS = os.getenv("DIRECT_UPLOADS", "0") == "1"
+PRESIGNED_EXPIRES_SEC = 900
+PRESIGNED_MAX_BYTES = 20 * 1024 * 1024
+# Shared by every upload: multipart above 8 MB, parts sent concurrently
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True,
+)
 
 # Get AWS credentials from environment variables (Streamlit Cloud secrets)
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -29,16 +67,76 @@ else:
     # Fallback to default credential chain (for local development)
     aws_session = boto3.Session(region_name=S3_REGION)
 
-# AWS Clients
-s3 = aws_session.client("s3")
-polly = aws_session.client("polly")
+# AWS Clients: created on first use, once per process, and shared by all threads/sessions.
+# boto3 Sessions are not thread-safe, so creation is serialized.
+CLIENT_CONFIG = Config(
+    max_pool_connections=max(10, UPLOAD_MAX_WORKERS * 4),
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+)
+# Polly is retried and rate limited by rate_limit.call_limited; botocore's own
+# retries are turned off so attempts don't multiply.
+SERVICE_CLIENT_CONFIG = {
+    "polly": Config(retries={"total_max_attempts": 1, "mode": "standard"}),
+}
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(service: str):
+    """Lazily created, memoized boto3 client for `service`."""
+    client = _clients.get(service)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(service)
+            if client is None:
+                client_config = CLIENT_CONFIG
+                if service in SERVICE_CLIENT_CONFIG:
+                    client_config = client_config.merge(SERVICE_CLIENT_CONFIG[service])
+                client = aws_session.client(service, config=client_config)
+                _clients[service] = client
+    return client
+
+class _LazyClient:
+    """Stands in for a client at module level (config.s3, config.polly) until first use."""
+    def __init__(self, service: str):
+        self._service = service
+
+    def __getattr__(self, name: str):
+        return getattr(get_client(self._service), name)
+
+s3 = _LazyClient("s3")
+polly = _LazyClient("polly")
+
+# Create the clients when the app process starts instead of on the first user request
+WARM_UP_CLIENTS = os.getenv("WARM_UP_CLIENTS", "0") == "1"
+
+def warm_up(services=("s3", "polly", "sts")) -> dict:
+    """Create clients ahead of the first request; returns seconds per service."""
+    timings = {}
+    for service in services:
+        start = time.perf_counter()
+        get_client(service)
+        timings[service] = round(time.perf_counter() - start, 4)
+    return timings
 
 MAX_POLLY_CHARS = 2500
+POLLY_VOICE_ID = "Burcu"
+POLLY_ENGINE = "neural"
+POLLY_OUTPUT_FORMAT = "mp3"
+# "ssml": chunks are <speak> documents with pauses between paragraphs and list items
+POLLY_TEXT_TYPE = os.getenv("POLLY_TEXT_TYPE", "text")
+TTS_MAX_WORKERS = 4  # concurrent Polly requests per answer
+# Neural SynthesizeSpeech quota is 8 TPS per account by default
+POLLY_RATE_PER_SEC = 8.0
+POLLY_MAX_WAIT_SEC = 60  # give up on a chunk (rate-limit waits + retries) after this long
+POLLY_LIMITER = rate_limit.AdaptiveLimiter("polly", POLLY_RATE_PER_SEC, POLLY_RATE_PER_SEC, burst=TTS_MAX_WORKERS)
 
 def get_aws_account_info() -> dict:
     """Get AWS account information to verify credentials."""
     try:
-        sts = aws_session.client("sts")
+        sts = get_client("sts")
         identity = sts.get_caller_identity()
         return {
             "account_id": identity.get("Account"),
@@ -71,68 +169,185 @@ def check_s3_access(bucket_name: str) -> Tuple[bool, str]:
     except Exception as e:
         return False, f"Error checking S3 access: {str(e)}"
 
-def tts_polly(text: str):
-    """Convert text to speech using AWS Polly and return audio bytes."""
-    response = polly.synthesize_speech(
-        Engine="neural",
-        VoiceId="Burcu",
-        OutputFormat="mp3",
-        Text=text
-    )
-    return response["AudioStream"].read()
+def _is_access_denied(error: Exception) -> bool:
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") == "AccessDenied"
 
-def split_text_for_polly(text: str, limit: int = MAX_POLLY_CHARS):
+def upload_image(fileobj, s3_key: str, sse: Optional[bool] = None, bucket: str = S3_RECORDING_BUCKET) -> dict:
     """
-    Splits long text into chunks smaller than Polly's limit.
-    Splits by sentences first; if needed, falls back to word splitting.
+    Upload one file with TRANSFER_CONFIG.
+    sse=None means it is not yet known whether the bucket requires ServerSideEncryption:
+    a plain upload is tried first and retried with AES256 on AccessDenied.
+    Returns {"sse": bool or None (what worked), "seconds": float, "error": Exception or None}.
     """
-    chunks = []
-    current = ""
-
-    sentences = text.split(". ")
-    for sentence in sentences:
-        # add back separator
-        sentence = sentence.strip()
-        if not sentence.endswith("."):
-            sentence += "."
-        sentence += " "
-
-        # Fits current chunk?
-        if len(current) + len(sentence) <= limit:
-            current += sentence
-        else:
-            # If sentence alone exceeds limit, split by words
-            if len(sentence) > limit:
-                words = sentence.split(" ")
-                temp = ""
-                for w in words:
-                    if len(temp) + len(w) + 1 <= limit:
-                        temp += w + " "
-                    else:
-                        chunks.append(temp.strip())
-                        temp = w + " "
-                if temp.strip():
-                    chunks.append(temp.strip())
+    start = time.time()
+    attempts = [sse] if sse is not None else [False, True]
+    for use_sse in attempts:
+        try:
+            fileobj.seek(0)
+            extra_args = {"ServerSideEncryption": "AES256"} if use_sse else None
+            s3.upload_fileobj(fileobj, bucket, s3_key, ExtraArgs=extra_args, Config=TRANSFER_CONFIG)
+            return {"sse": use_sse, "seconds": time.time() - start, "error": None}
+        except Exception as e:
+            if sse is None and not use_sse and _is_access_denied(e):
                 continue
+            return {"sse": None, "seconds": time.time() - start, "error": e}
 
-            chunks.append(current.strip())
-            current = sentence
+def upload_images(items: List[Tuple[object, str]], sse: Optional[bool] = None,
+                  bucket: str = S3_RECORDING_BUCKET, max_workers: int = UPLOAD_MAX_WORKERS) -> List[dict]:
+    """
+    Upload (fileobj, s3_key) pairs in parallel; results are returned in input order.
+    If the SSE requirement is unknown, the first file is uploaded alone to learn it,
+    so the others do not each pay for a failed attempt.
+    """
+    results: List[dict] = [None] * len(items)
+    first = 0
+    if sse is None and items:
+        results[0] = upload_image(items[0][0], items[0][1], None, bucket)
+        sse = results[0]["sse"]
+        first = 1
+    rest = list(enumerate(items))[first:]
+    if rest:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rest)))) as pool:
+            futures = [(i, pool.submit(upload_image, fileobj, s3_key, sse, bucket)) for i, (fileobj, s3_key) in rest]
+            for i, fut in futures:
+                results[i] = fut.result()
+    return results
 
-    if current.strip():
-        chunks.append(current.strip())
+def presign_image_post(prefix: str, sse: bool = False, expires_in: int = PRESIGNED_EXPIRES_SEC) -> dict:
+    """
+    Presigned POST that lets the browser upload any number of images under `prefix`
+    (the policy only requires the key to start with `prefix`; the uploader picks a
+    unique key per file).
+    Returns {"url": ..., "fields": {...}} as produced by boto3.
+    """
+    fields = {}
+    conditions = [
+        ["starts-with", "$Content-Type", "image/"],
+        ["content-length-range", 1, PRESIGNED_MAX_BYTES],
+    ]
+    if sse:
+        fields["x-amz-server-side-encryption"] = "AES256"
+        conditions.append({"x-amz-server-side-encryption": "AES256"})
+    return s3.generate_presigned_post(
+        Bucket=S3_RECORDING_BUCKET,
+        Key=prefix + "${filename}",
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=expires_in,
+    )
 
-    return chunks
+def presign_image_put(s3_key: str, content_type: str, expires_in: int = PRESIGNED_EXPIRES_SEC) -> str:
+    """Presigned PUT URL for a single object (for clients that cannot send multipart forms)."""
+    return s3.generate_presigned_url(
+        "put_object",
+        Params={"Bucket": S3_RECORDING_BUCKET, "Key": s3_key, "ContentType": content_type},
+        ExpiresIn=expires_in,
+    )
 
-def tts_polly_safe(text: str):
+def _trace_headers(payload: dict) -> dict:
+    correlation_id = payload.get("correlation_id")
+    return {"X-Correlation-Id": correlation_id} if correlation_id else {}
+
+def _decoded_answer(response_json: dict) -> Optional[str]:
+    """Assistant text from `decoded_outputs`, or None when the endpoint returned no answer."""
+    decoded = response_json.get("decoded_outputs") or []
+    return (decoded[0].get("data") or None) if decoded else None
+
+def fetch_answer(payload: dict, url: str = API_URL, trace: tracing.Trace = tracing.NOOP) -> Optional[str]:
+    """
+    POST the payload and return the assistant text from `decoded_outputs`
+    (None when there is none, so it is never cached as an answer).
+    A stage breakdown in the response (`trace`) is merged into `trace`.
+    """
+    response = http_session.post(url, json=payload, headers=_trace_headers(payload))
+    response.raise_for_status()
+    response_json = response.json()
+    print()
+    print(response_json)
+    trace.merge(response_json.get("trace"))
+    # frequency = response_json.get("kb_subjects_freq")
+    return _decoded_answer(response_json)
+
+def get_kb_version() -> str:
+    """Current knowledge-base version (KB_VERSION_PARAMETER in SSM Parameter Store)."""
+    return get_client("ssm").get_parameter(Name=KB_VERSION_PARAMETER)["Parameter"]["Value"]
+
+def get_answer_cache() -> answer_cache.AnswerCache:
+    """Shared answer cache (see answer_cache), cleared when get_kb_version() changes."""
+    return answer_cache.get_answer_cache(get_kb_version)
+
+def get_tts_cache() -> tts_cache.TTSCache:
+    """Shared Polly audio cache (see tts_cache)."""
+    return tts_cache.get_tts_cache(s3)
+
+def tts_polly(text: str, cache: tts_cache.TTSCache = None, trace: tracing.Trace = tracing.NOOP,
+              text_type: str = "text"):
+    """Convert text (or an SSML document) to speech using AWS Polly and return audio bytes (cached per chunk)."""
+    cache = cache or get_tts_cache()
+    key = tts_cache.cache_key(text, POLLY_VOICE_ID, POLLY_ENGINE, POLLY_OUTPUT_FORMAT)
+    audio = cache.get(key)
+    if audio is not None:
+        return audio
+    with trace.span("polly.synth"):
+        response = rate_limit.call_limited(
+            POLLY_LIMITER, polly.synthesize_speech,
+            deadline=time.time() + POLLY_MAX_WAIT_SEC,
+            Engine=POLLY_ENGINE,
+            VoiceId=POLLY_VOICE_ID,
+            OutputFormat=POLLY_OUTPUT_FORMAT,
+            TextType=text_type,
+            Text=text
+        )
+        audio = response["AudioStream"].read()
+    cache.put(key, audio)
+    return audio
+
+def split_text_for_polly(text: str, limit: int = MAX_POLLY_CHARS, ssml: bool = False) -> List[str]:
     """
-    Uses your original tts_polly() and safely handles long text
-    by splitting → synthesizing each part → concatenating MP3 bytes.
+    Splits long text into as few chunks under Polly's limit as possible, at
+    sentence boundaries (Turkish abbreviations and list items aware); see polly_text.
     """
-    parts = split_text_for_polly(text)
+    return polly_text.split_text(text, limit, ssml)
+
+def tts_chunk_keys(text: str) -> List[str]:
+    """TTS-cache keys of the chunks iter_tts_polly synthesizes for `text`, in playback order."""
+    parts = split_text_for_polly(text, ssml=POLLY_TEXT_TYPE == "ssml")
+    return [tts_cache.cache_key(p, POLLY_VOICE_ID, POLLY_ENGINE, POLLY_OUTPUT_FORMAT) for p in parts]
 
-    full_audio = b""
-    for i, chunk in enumerate(parts):
-        print(f"Generating chunk {i+1}/{len(parts)} ({len(chunk)} chars)")
-        full_audio += tts_polly(chunk)
+def _tts_chunk(i: int, total: int, chunk: str, cache: tts_cache.TTSCache,
+               trace: tracing.Trace = tracing.NOOP, text_type: str = "text") -> bytes:
+    print(f"Generating chunk {i+1}/{total} ({len(chunk)} chars)")
+    return tts_polly(chunk, cache, trace, text_type)
+
+def iter_tts_polly(text: str, max_workers: int = TTS_MAX_WORKERS,
+                   trace: tracing.Trace = tracing.NOOP) -> Iterator[bytes]:
+    """
+    Synthesizes all chunks concurrently (at most max_workers in flight) and
+    yields their MP3 bytes in order, each as soon as it and every chunk before
+    it are ready, so playback can start on the first chunk.
+    """
+    ssml = POLLY_TEXT_TYPE == "ssml"
+    parts = split_text_for_polly(text, ssml=ssml)
+    if not parts:
+        return
+    # Resolve the st.cache_resource singleton here, on the script thread, not in the workers
+    cache = get_tts_cache()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(parts)))) as pool:
+        futures = [pool.submit(_tts_chunk, i, len(parts), chunk, cache, trace, "ssml" if ssml else "text")
+                   for i, chunk in enumerate(parts)]
+        try:
+            for fut in futures:
+                yield fut.result()
+        finally:
+            for fut in futures:
+                fut.cancel()
 
-    return full_audio
+def tts_polly_safe(text: str):
+    """
+    Safely handles long text by splitting → synthesizing the parts
+    concurrently → concatenating MP3 bytes in order.
+    """
+    full_audio = io.BytesIO()
+    for audio in iter_tts_polly(text):
+        full_audio.write(audio)
+    return full_audio.getvalue()
@@ -0,0 +1,46 @@
+import os
+import time
+import uuid
+from typing import List, Tuple
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+import config
+
+# Uploads each picked file with the presigned POST and returns {"prefix", "keys", "pending"}:
+# the keys S3 accepted and the number of uploads still in flight.
+_uploader = components.declare_component(
+    "direct_upload", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "direct_upload_frontend"))
+
+def _current_upload() -> dict:
+    """Per-session upload prefix with its presigned POST, renewed when it is about to expire."""
+    current = st.session_state.get("direct_upload")
+    if current is None or current["expires_at"] - time.time() < 60:
+        prefix = current["prefix"] if current else f"{config.S3_IMAGE_PREFIX}direct/{uuid.uuid4().hex}/"
+        post = config.presign_image_post(prefix, sse=bool(st.session_state.get("s3_requires_sse")))
+        current = {"prefix": prefix, "post": post, "expires_at": time.time() + config.PRESIGNED_EXPIRES_SEC,
+                   "sent": current["sent"] if current else set()}
+        st.session_state["direct_upload"] = current
+    return current
+
+def render_uploader() -> None:
+    """File picker that uploads from the browser straight to S3 and reports the confirmed keys."""
+    current = _current_upload()
+    st.session_state["direct_upload_report"] = _uploader(
+        post={**current["post"], "prefix": current["prefix"]}, key="direct_upload_files", default=None)
+
+def collect_uploaded_uris() -> Tuple[List[str], int]:
+    """
+    URIs of the uploads S3 confirmed that no earlier turn has sent, and the
+    number of uploads still in flight (they go with a later turn). Only keys
+    under this session's prefix are taken.
+    """
+    current = st.session_state.get("direct_upload")
+    report = st.session_state.get("direct_upload_report") or {}
+    if current is None or report.get("prefix") != current["prefix"]:
+        return [], 0
+    keys = [key for key in report.get("keys", [])
+            if key.startswith(current["prefix"]) and key not in current["sent"]]
+    current["sent"].update(keys)
+    return [f"s3://{config.S3_RECORDING_BUCKET}/{key}" for key in keys], int(report.get("pending") or 0)
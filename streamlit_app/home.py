@@ -1,4 +1,5 @@
 from datetime import datetime
+import io
 import streamlit as st
 import requests
 import time
@@ -6,6 +7,29 @@ from botocore.exceptions import ClientError
 
 # Import shared utilities and config
 import config
+import aws_status
+import chat_history
+import direct_upload
+import tracing
+
+def _play_answer_audio(text: str, trace: tracing.Trace = tracing.NOOP):
+    """
+    One player per answer. The first Polly chunk autoplays as soon as it is
+    synthesized; once every chunk is ready the same player is swapped for the
+    whole answer, resuming at the second the first chunk had reached.
+    """
+    player = st.empty()
+    full_audio = io.BytesIO()
+    chunks = 0
+    for audio_bytes in config.iter_tts_polly(text, trace=trace):
+        full_audio.write(audio_bytes)
+        chunks += 1
+        if chunks == 1:
+            player.audio(audio_bytes, format="audio/mp3", autoplay=True)
+            playing_since = time.time()
+    if chunks > 1:
+        player.audio(full_audio.getvalue(), format="audio/mp3", autoplay=True,
+                     start_time=int(time.time() - playing_since))
 
 def home_page():
     """Home page with chat functionality."""
@@ -15,14 +39,9 @@ def home_page():
     import sidebar
     uploaded_images = sidebar.render_sidebar()
     
-    # Initialize chat history
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-     
-    # Display previous messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # Bounded history: only the recent window is rendered on each rerun
+    history = chat_history.get_chat_history()
+    chat_history.render(history, config.get_tts_cache())
      
     user_input = st.chat_input("Your question...")
     
@@ -35,18 +54,28 @@ def home_page():
                     st.image(img, caption=img.name, use_container_width=True)
             # if uploaded_audio:
             #     st.audio(uploaded_audio, format="audio/mp3")
-            st.session_state.messages.append({"role": "user", "content": user_input})
+            history.append("user", user_input)
 
         with st.spinner("Generating response..."):
             start_time = time.time()
+            # Per-stage timings of this turn; the correlation ID ties them to the Lambda's logs
+            trace = tracing.new_trace()
             # --- Prepare payload ---
             file_name_base = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            payload = {"user_input": user_input, "image_path": []}
+            payload = {"user_input": user_input, "image_path": [], "correlation_id": trace.correlation_id}
+            upload_timings = {}
+
+            # Direct uploads are already in S3; only their URIs go into the payload
+            if config.DIRECT_UPLOADS:
+                payload["image_path"], uploading = direct_upload.collect_uploaded_uris()
+                if uploading:
+                    st.info(f"{uploading} image(s) still uploading; they will be sent with your next message.")
 
             # Upload images to S3 and add S3 URIs
             if uploaded_images:
                 # Check bucket access first
-                has_access, access_msg = config.check_s3_access(config.S3_RECORDING_BUCKET)
+                status = aws_status.get_aws_status()
+                has_access, access_msg = status.get()["bucket_access"]
                 if not has_access:
                     st.error(f"❌ S3 Access Error: {access_msg}")
                     st.info("💡 **To fix this issue:**\n"
@@ -56,27 +85,17 @@ def home_page():
                            "   - `s3:PutObject` on `arn:aws:s3:::gelir-vergisi/recordings/*`\n"
                            "   - `s3:ListBucket` on `arn:aws:s3:::gelir-vergisi`")
                 else:
-                    for img in uploaded_images:
-                        image_name = f"{file_name_base}_{img.name}"
-                        s3_key = f"{config.S3_IMAGE_PREFIX}{image_name}"
+                    uploads = [(img, f"{config.S3_IMAGE_PREFIX}{file_name_base}_{img.name}") for img in uploaded_images]
+                    # Whether the bucket needs ServerSideEncryption is learned once per session
+                    results = config.upload_images(uploads, sse=st.session_state.get("s3_requires_sse"))
+                    for (img, s3_key), result in zip(uploads, results):
+                        upload_timings[img.name] = result["seconds"]
+                        trace.record("s3.upload", result["seconds"] * 1000)
+                        if result["sse"] is not None:
+                            st.session_state["s3_requires_sse"] = result["sse"]
                         try:
-                            # Reset file pointer to beginning
-                            img.seek(0)
-                            # Try upload with default settings first
-                            try:
-                                config.s3.upload_fileobj(img, config.S3_RECORDING_BUCKET, s3_key)
-                            except ClientError as upload_error:
-                                # If AccessDenied, try with server-side encryption
-                                if upload_error.response.get("Error", {}).get("Code") == "AccessDenied":
-                                    img.seek(0)
-                                    config.s3.upload_fileobj(
-                                        img, 
-                                        config.S3_RECORDING_BUCKET, 
-                                        s3_key,
-                                        ExtraArgs={'ServerSideEncryption': 'AES256'}
-                                    )
-                                else:
-                                    raise
+                            if result["error"] is not None:
+                                raise result["error"]
                             payload["image_path"].append(f"s3://{config.S3_RECORDING_BUCKET}/{s3_key}")
                         except ClientError as e:
                             error_code = e.response.get("Error", {}).get("Code", "")
@@ -84,9 +103,11 @@ def home_page():
                             error_details = e.response.get("Error", {})
                             
                             # Get account info for debugging
-                            account_info = config.get_aws_account_info()
+                            account_info = status.get()["account_info"]
                             
                             if error_code == "AccessDenied":
+                                # Access changed since the last check; re-check on the next read
+                                status.invalidate()
                                 st.error(f"❌ Access Denied uploading image {img.name}")
                                 with st.expander("🔍 Error Details"):
                                     st.write(f"**Error Code:** {error_code}")
@@ -113,19 +134,29 @@ def home_page():
 
             # payload["audio_path"].append(f"s3://{config.S3_RECORDING_BUCKET}/{s3_key}")
 
+            # --- Answer cache (text-only questions) ---
+            cache_hit = None
+            answer_failed = False
+            answers = config.get_answer_cache()
+            cacheable = not payload["image_path"]
+            if cacheable:
+                with trace.span("answer_cache"):
+                    cache_hit = answers.lookup(user_input)
+            if cache_hit:
+                assistant_output = cache_hit[0]
             # --- Send to Lambda URL ---
-            try:
-                response = requests.post(config.API_URL, json=payload)
-                response.raise_for_status()
-                response_json = response.json()
-                print()
-                print(response_json)
-                decoded = response_json.get("decoded_outputs", [])
-                # frequency = response_json.get("kb_subjects_freq")
-                assistant_output = decoded[0]["data"] if decoded else "No output returned."
-            except requests.exceptions.RequestException as e:
-                st.error(f"Error calling Lambda: {e}")
-                assistant_output = None
+            else:
+                try:
+                    with trace.span("answer"):
+                        assistant_output = config.fetch_answer(payload, trace=trace)
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Error calling Lambda: {e}")
+                    assistant_output, answer_failed = None, True
+            # Only non-empty answers are cached
+            if cacheable and not cache_hit and assistant_output:
+                answers.store(user_input, assistant_output)
+            elif not assistant_output and not answer_failed:
+                st.warning("No output returned.")
 
             end_time = time.time()
             execution_time = end_time - start_time
@@ -133,13 +164,34 @@ def home_page():
             if assistant_output:
                 with st.chat_message("assistant"):
                     st.write(assistant_output)
-                    st.session_state.messages.append({"role": "assistant", "content": assistant_output})
-                    with st.expander("Details"):
+                    # Audio is kept as TTS-cache keys; reruns replay it from the cache, not from Polly
+                    history.append("assistant", assistant_output, config.tts_chunk_keys(assistant_output))
+                    details = st.expander("Details")
+                    with details:
                         st.write(f"Execution time: {execution_time:.4f} seconds")
+                        for name, seconds in upload_timings.items():
+                            st.write(f"Upload {name}: {seconds:.4f} seconds")
+                        if cache_hit:
+                            st.write(f"Answer cache: hit (similarity {cache_hit[1]:.2f})")
                         # st.write(f"Frequency: {frequency}")
-                    audio_bytes = config.tts_polly_safe(assistant_output)
-                    st.audio(audio_bytes, format="audio/mp3")
+                    with trace.span("tts"):
+                        _play_answer_audio(assistant_output, trace)
+                    with details:
+                        tts_stats = config.get_tts_cache().stats()
+                        st.write(f"TTS cache hit rate: {tts_stats['hit_rate']:.0%} "
+                                 f"(memory {tts_stats['memory_hits']}, persistent {tts_stats['persistent_hits']}, "
+                                 f"misses {tts_stats['misses']})")
+                        polly_stats = config.POLLY_LIMITER.stats()
+                        if polly_stats["retries"] or polly_stats["throttles"]:
+                            st.write(f"Polly: {polly_stats['throttles']} throttled, {polly_stats['retries']} retried, "
+                                     f"rate {polly_stats['rate_per_sec']}/s")
+                        stages = trace.breakdown()
+                        if stages:
+                            st.write(f"Stage breakdown (correlation ID `{trace.correlation_id}`):")
+                            st.table([{"stage": name, "count": v["count"], "total ms": v["total_ms"],
+                                       "max ms": v["max_ms"]} for name, v in stages.items()])
                     # send_to_lambda(user_input, assistant_output, frequency, namespace="vergi")
+            trace.emit()
 
     else:
         with st.chat_message("assistant"):
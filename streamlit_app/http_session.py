@@ -0,0 +1,49 @@
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CONNECT_TIMEOUT_SEC = 5
+# The answer endpoint runs a Bedrock flow; a full (non-streamed) answer can take a while
+HTTP_READ_TIMEOUT_SEC = 120
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT_SEC, HTTP_READ_TIMEOUT_SEC)
+HTTP_POOL_SIZE = 10
+# Connection failures are retried for every method (nothing was sent yet); read and
+# 5xx failures only for idempotent methods, so a POST to the Lambda URL is never repeated.
+HTTP_RETRY = Retry(total=3, connect=3, read=2, status=2, backoff_factor=0.3,
+                   status_forcelist=(502, 503, 504), allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                   raise_on_status=False)
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Process-wide keep-alive session (shared by all sessions and reruns), so
+    consecutive questions reuse the TLS connection to the Lambda URL.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=HTTP_RETRY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+def connection_stats(session: requests.Session) -> dict:
+    """Requests sent vs. connections opened by the session's urllib3 pools."""
+    requests_total = connections = 0
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_total += pool.num_requests
+                connections += pool.num_connections
+    reuse = 1 - connections / requests_total if requests_total else 0.0
+    return {"requests": requests_total, "connections": connections, "reuse": round(reuse, 3)}
+
+def post(url: str, **kwargs) -> requests.Response:
+    """session.post with the default timeout; logs connection reuse after each call."""
+    session = get_http_session()
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    response = session.post(url, **kwargs)
+    print(f"HTTP pool: {connection_stats(session)}")
+    return response
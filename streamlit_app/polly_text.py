@@ -0,0 +1,147 @@
+import re
+from typing import Callable, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+# Polly bills at most 3000 characters of plain text per request; an SSML request may be
+# 6000 characters with tags. In SSML mode the chunk limit covers the whole document
+# (tags included), so one limit keeps both under the quota.
+SSML_OPEN, SSML_CLOSE = "<speak>", "</speak>"
+SSML_BREAKS = {"item": '<break time="400ms"/>', "paragraph": '<break time="700ms"/>'}
+
+# Words that end in a period without ending the sentence; compared lower-cased, without
+# the final period ("vb." -> "vb", "A.Ş." -> "a.ş")
+ABBREVIATIONS = frozenset({
+    "vb", "vs", "vd", "md", "mad", "no", "nr", "s", "sy", "sf", "sa", "bkz", "örn", "ör", "krş", "yy",
+    "dr", "prof", "doç", "av", "müh", "sn", "bşk", "gen", "mah", "cad", "sok", "tic", "san", "ltd", "şti",
+    "a.ş", "t.c", "r.g", "fık", "tbl", "yön", "gvk", "kdvk", "vuk", "tck", "tbk", "ttk",
+})
+
+# Sentence-final punctuation (plus closing quotes/brackets) followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?…]+[)\]\"'”’»]*(?=\s)")
+_NEXT_CHAR = re.compile(r"\s*(\S)")
+# "- x", "* x", "• x" (marker dropped) or "1. x", "2) x", "a) x" (numbering kept, it is read out)
+_LIST_ITEM = re.compile(r"(?:([-*•·])|\d{1,3}[.)]|[a-zçğıöşü][.)])\s+")
+_CLAUSE_BREAK = re.compile(r"(?<=[;:,])\s+")
+
+def _lower_tr(word: str) -> str:
+    """Turkish lower-casing: 'I' -> 'ı' and 'İ' -> 'i' (str.lower() maps both differently)."""
+    return word.replace("I", "ı").replace("İ", "i").lower()
+
+def _blocks(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    (block, pause before it). Paragraphs are separated by blank lines and
+    soft-wrapped lines are joined; every list item is a block of its own.
+    pause is "paragraph" after a blank line, "item" after a single line break.
+    """
+    block: List[str] = []
+    pause, in_item = "paragraph", False
+    for raw in text.splitlines():
+        line = raw.strip()
+        item = _LIST_ITEM.match(line) if line else None
+        if block and (not line or item or in_item):
+            yield " ".join(block), pause
+            block, pause = [], "item"
+        if not line:
+            pause, in_item = "paragraph", False
+            continue
+        if item and item.group(1):
+            line = line[item.end():]
+        in_item = item is not None
+        block.append(line)
+    if block:
+        yield " ".join(block), pause
+
+def _sentences(block: str) -> Iterator[str]:
+    """
+    Sentences of one block. A period is not a boundary after a known
+    abbreviation, a number (ordinals, list numbering) or a single letter
+    (initials), and no punctuation is one when the next word starts
+    lower-case or with a digit ("1. md.", "vb. unsurlar", "No. 312").
+    """
+    start = 0
+    for m in _SENTENCE_END.finditer(block):
+        nxt = _NEXT_CHAR.match(block, m.end())
+        if nxt is None:
+            break
+        first = nxt.group(1)
+        if first.islower() or first.isdigit():
+            continue
+        if m.group()[0] == "." and m.group().count(".") == 1:
+            word = block[block.rfind(" ", start, m.start()) + 1:m.start()].lstrip("(\"'“‘«")
+            if _lower_tr(word) in ABBREVIATIONS or word.isdigit() or (len(word) == 1 and word.isalpha()):
+                continue
+        yield block[start:m.end()].strip()
+        start = m.end()
+    tail = block[start:].strip()
+    if tail:
+        yield tail
+
+def _units(text: str) -> Iterator[Tuple[str, str]]:
+    """(sentence, pause before it); pause is "sentence" inside a block."""
+    for block, pause in _blocks(text):
+        for i, sentence in enumerate(_sentences(block)):
+            yield sentence, pause if i == 0 else "sentence"
+
+def _split_long(text: str, limit: int, measure: Callable[[str], int]) -> Iterator[str]:
+    """
+    Pieces of a sentence over the limit, each with measure(piece) <= limit, for
+    the packer to fill chunks with: its clauses (split after ; : ,), the words
+    of a clause over the limit, and limit-sized slices of a word over the limit.
+    """
+    for clause in _CLAUSE_BREAK.split(text):
+        if measure(clause) <= limit:
+            yield clause
+            continue
+        for word in clause.split():
+            if measure(word) <= limit:
+                yield word
+                continue
+            start = size = 0
+            for i, ch in enumerate(word):
+                cost = measure(ch)
+                if size + cost > limit:
+                    yield word[start:i]
+                    start, size = i, 0
+                size += cost
+            yield word[start:]
+
+def _ssml_len(text: str) -> int:
+    return len(escape(text))
+
+def split_text(text: str, limit: int, ssml: bool = False) -> List[str]:
+    """
+    Splits text into as few chunks of at most `limit` characters as possible,
+    cutting only between sentences (or, for a sentence over the limit, between
+    clauses and words). Greedy packing in one pass over the text: O(len(text)).
+    With ssml=True each chunk is a <speak> document with pauses between
+    paragraphs and list items. Never returns empty chunks.
+    """
+    measure: Callable[[str], int] = _ssml_len if ssml else len
+    budget = limit - len(SSML_OPEN) - len(SSML_CLOSE) if ssml else limit
+    chunks: List[str] = []
+    parts: List[str] = []
+    size = 0
+    for unit, pause in _units(text):
+        pieces = _split_long(unit, budget, measure) if measure(unit) > budget else (unit,)
+        for piece in pieces:
+            rendered = escape(piece) if ssml else piece
+            if pause == "sentence":
+                sep = " "
+            elif ssml:
+                sep = f" {SSML_BREAKS[pause]} "
+            else:
+                sep = "\n\n" if pause == "paragraph" else "\n"
+            if parts and size + len(sep) + len(rendered) > budget:
+                chunks.append("".join(parts))
+                parts, size = [], 0
+            if parts:
+                parts.append(sep)
+                size += len(sep)
+            parts.append(rendered)
+            size += len(rendered)
+            pause = "sentence"
+    if parts:
+        chunks.append("".join(parts))
+    if ssml:
+        return [f"{SSML_OPEN}{chunk}{SSML_CLOSE}" for chunk in chunks]
+    return chunks
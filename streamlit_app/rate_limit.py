@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+from typing import Optional
+
+RATE_MIN_PER_SEC = 0.2
+RETRY_MAX_ATTEMPTS = 6
+RETRY_BASE_SEC = 0.25
+RETRY_MAX_SEC = 8.0
+
+_THROTTLE_CODES = {"ThrottlingException", "Throttling", "TooManyRequestsException", "LimitExceededException",
+                   "RequestLimitExceeded", "ServiceQuotaExceededException"}
+_TRANSIENT_CODES = {"ServiceUnavailableException", "ServiceFailureException", "InternalServerException",
+                    "InternalFailure", "ServiceUnavailable"}
+_TRANSIENT_ERRORS = {"EndpointConnectionError", "ConnectionClosedError", "ReadTimeoutError", "ConnectTimeoutError"}
+
+def _error_code(e: Exception) -> str:
+    response = getattr(e, "response", None)
+    return response.get("Error", {}).get("Code", "") if isinstance(response, dict) else ""
+
+class AdaptiveLimiter:
+    """
+    Thread-safe token bucket whose rate adapts to throttling: halved on every
+    throttle, raised by max_rate/50 on every success (AIMD).
+    One instance per service, shared by all sessions of the process.
+    """
+
+    def __init__(self, name: str, rate: float, max_rate: float, min_rate: float = RATE_MIN_PER_SEC,
+                 burst: Optional[float] = None):
+        self.name = name
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "throttles": 0, "transient_errors": 0, "wait_ms": 0.0}
+
+    def acquire(self, deadline: Optional[float] = None) -> None:
+        """Take one token; TimeoutError if none is available before `deadline` (time.time())."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._stats["calls"] += 1
+                    self._stats["wait_ms"] += waited * 1000
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and time.time() + wait > deadline:
+                raise TimeoutError(f"{self.name} rate limit: no capacity before the deadline")
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self._stats["throttles"] += 1
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["wait_ms"] = round(out["wait_ms"], 1)
+            out["rate_per_sec"] = round(self.rate, 2)
+        return out
+
+def call_limited(limiter: AdaptiveLimiter, fn, *args, deadline: Optional[float] = None, **kwargs):
+    """
+    Call fn(*args, **kwargs) through `limiter`. Throttling and transient errors are
+    retried with full-jitter exponential backoff, up to RETRY_MAX_ATTEMPTS; the last
+    error is raised when a backoff would pass `deadline`.
+    """
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        limiter.acquire(deadline)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            code = _error_code(e)
+            if code in _THROTTLE_CODES:
+                limiter.on_throttle()
+            elif code in _TRANSIENT_CODES or type(e).__name__ in _TRANSIENT_ERRORS:
+                limiter.count("transient_errors")
+            else:
+                raise
+            backoff = random.uniform(0, min(RETRY_MAX_SEC, RETRY_BASE_SEC * 2 ** attempt))
+            if attempt + 1 == RETRY_MAX_ATTEMPTS or (deadline is not None and time.time() + backoff > deadline):
+                raise
+            limiter.count("retries")
+            time.sleep(backoff)
+            continue
+        limiter.on_success()
+        return result
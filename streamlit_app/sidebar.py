@@ -1,5 +1,7 @@
 import streamlit as st
 import config
+import aws_status
+import direct_upload
 
 def render_sidebar():
     """Render the sidebar content that appears on all pages."""
@@ -8,7 +10,8 @@ def render_sidebar():
 
         # AWS Diagnostics
         with st.expander("🔧 AWS Diagnostics", expanded=False):
-            account_info = config.get_aws_account_info()
+            status = aws_status.get_aws_status().get()
+            account_info = status["account_info"]
             if "error" not in account_info:
                 st.success("✅ AWS Credentials: Valid")
                 st.write(f"**Account ID:** {account_info.get('account_id', 'Unknown')}")
@@ -17,7 +20,7 @@ def render_sidebar():
                 st.error(f"❌ AWS Credentials Error: {account_info.get('error')}")
             
             # Check bucket access
-            has_access, access_msg = config.check_s3_access(config.S3_RECORDING_BUCKET)
+            has_access, access_msg = status["bucket_access"]
             if has_access:
                 st.success(f"✅ Bucket Access: {config.S3_RECORDING_BUCKET}")
             else:
@@ -26,12 +29,17 @@ def render_sidebar():
         st.sidebar.title("Dosya Yükle")
      
         # Image/document upload (preview only)
-        uploaded_images = st.file_uploader(
-            "Bir belge seç",
-            type=["png", "jpg", "jpeg"],
-            accept_multiple_files=True,
-            key="image_uploader",
-        )
+        if config.DIRECT_UPLOADS:
+            # Browser -> S3 directly; home_page sends the keys the uploader confirmed
+            direct_upload.render_uploader()
+            uploaded_images = []
+        else:
+            uploaded_images = st.file_uploader(
+                "Bir belge seç",
+                type=["png", "jpg", "jpeg"],
+                accept_multiple_files=True,
+                key="image_uploader",
+            )
      
         if uploaded_images:
             st.sidebar.write("Önizleme:")
@@ -59,14 +67,7 @@ def render_sidebar():
         #     uploaded_audio = recorded_audio
      
         st.sidebar.title("Örnek Sorular")
-        st.write(
-            "Gelirin unsurları nelerdir?",
-        )
-        st.write(
-            "Merhaba, Ocak 2024 döneminde bazı faturalarımızda KDV oranını yanlışlıkla yüzde 20 yerine yüzde 10 uyguladığımızı fark ettik. Bu nedenle beyannamenin düzeltilmesini talep ediyoruz.",
-        )
-        st.write(
-            "İç denetimde, 2024/Ocak dönemine ait bazı hizmet faturalarında KDV oranının hatalı uygulandığı tespit edilmiştir. Sorunun çözümü için referans alınması gereken mevzuatlar nelerdir?",
-        )
+        for question in config.EXAMPLE_QUESTIONS:
+            st.write(question)
     
     return uploaded_images
@@ -1,11 +1,31 @@
 import streamlit as st
 
 # Import page modules
+import config
 from home import home_page
 from diagram import diagram_page
 
 st.set_page_config(page_title="Vergi Asistanı", page_icon="🤖", layout="wide")
 
+@st.cache_resource
+def warm_up_clients():
+    """Runs once per process; later reruns reuse the clients."""
+    return config.warm_up()
+
+if config.WARM_UP_CLIENTS:
+    warm_up_clients()
+
+@st.cache_resource
+def prewarm_example_answers():
+    """Answer the sidebar examples in the background once per process."""
+    return config.get_answer_cache().prewarm(
+        config.EXAMPLE_QUESTIONS,
+        lambda question: config.fetch_answer({"user_input": question, "image_path": []}),
+    )
+
+if config.PREWARM_EXAMPLE_ANSWERS:
+    prewarm_example_answers()
+
 # Navigation
 page = st.navigation([
     st.Page(home_page, title="Home", icon="🏠"),
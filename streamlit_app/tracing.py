@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+# TRACE_ENABLED=0 turns every span into a shared no-op and skips the metrics line
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_NAMESPACE = "GelirVergisi/Streamlit"
+
+class _Span:
+    __slots__ = ("trace", "stage", "t0")
+
+    def __init__(self, trace: "Trace", stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.record(self.stage, (time.perf_counter() - self.t0) * 1000)
+        return False
+
+class Trace:
+    """
+    Stage timings of one chat turn, {stage: [count, total_ms, max_ms]}.
+    Safe to record into from worker threads (uploads, Polly chunks).
+    """
+
+    def __init__(self, correlation_id: Optional[str] = None):
+        self.correlation_id = correlation_id or uuid.uuid4().hex
+        self._stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str) -> _Span:
+        """with trace.span("s3.upload"): ..."""
+        return _Span(self, stage)
+
+    def record(self, stage: str, ms: float) -> None:
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+
+    def merge(self, remote: Optional[dict], prefix: str = "lambda.") -> None:
+        """Add a breakdown returned by the Lambda ({"stages": {stage: {...}}}) under `prefix`."""
+        for stage, values in ((remote or {}).get("stages") or {}).items():
+            with self._lock:
+                self._stages[f"{prefix}{stage}"] = [values.get("count", 1), values.get("total_ms", 0.0),
+                                                    values.get("max_ms", 0.0)]
+
+    def breakdown(self) -> Dict[str, dict]:
+        with self._lock:
+            return {stage: {"count": n, "total_ms": round(total, 1), "max_ms": round(peak, 1)}
+                    for stage, (n, total, peak) in self._stages.items()}
+
+    def emit(self) -> None:
+        """Print the breakdown as one CloudWatch Embedded Metric Format line (<stage>_ms metrics)."""
+        stages = self.breakdown()
+        doc = {
+            "_aws": {"Timestamp": int(time.time() * 1000), "CloudWatchMetrics": [{
+                "Namespace": TRACE_NAMESPACE, "Dimensions": [[]],
+                "Metrics": [{"Name": f"{stage}_ms", "Unit": "Milliseconds"} for stage in stages],
+            }]},
+            "correlation_id": self.correlation_id,
+            "stages": stages,
+        }
+        for stage, values in stages.items():
+            doc[f"{stage}_ms"] = values["total_ms"]
+        print(json.dumps(doc, ensure_ascii=False))
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class NoopTrace(Trace):
+    """Used when tracing is disabled: keeps the correlation ID, records nothing."""
+
+    def span(self, stage: str) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    def record(self, stage: str, ms: float) -> None:
+        pass
+
+    def merge(self, remote: Optional[dict], prefix: str = "lambda.") -> None:
+        pass
+
+    def emit(self) -> None:
+        pass
+
+NOOP = NoopTrace("")
+
+def new_trace() -> Trace:
+    """A trace for one chat turn; its correlation_id goes into the Lambda payload."""
+    return Trace() if TRACE_ENABLED else NoopTrace()
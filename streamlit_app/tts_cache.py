@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import streamlit as st
+
+# In-process tier (shared by all sessions through st.cache_resource)
+TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Optional persistent tiers, e.g. TTS_CACHE_DIR=/tmp/tts-cache or TTS_CACHE_S3_URI=s3://gelir-vergisi/tts-cache/
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR")
+TTS_CACHE_DIR_MAX_BYTES = int(os.getenv("TTS_CACHE_DIR_MAX_BYTES", str(512 * 1024 * 1024)))
+TTS_CACHE_S3_URI = os.getenv("TTS_CACHE_S3_URI")
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share one audio chunk."""
+    return " ".join(text.split())
+
+def cache_key(text: str, voice_id: str, engine: str, output_format: str) -> str:
+    """Key for one Polly chunk: normalized text plus every setting that changes the audio."""
+    h = hashlib.sha256()
+    for part in (normalize_text(text), voice_id, engine, output_format):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class _DiskTier:
+    """One file per chunk; least recently read files are removed past max_bytes."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.audio")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key: str, audio: bytes) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".audio"):
+                    continue
+                try:
+                    info = os.stat(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+                total -= size
+
+class _S3Tier:
+    """Objects under s3://bucket/prefix/; expiry is left to a bucket lifecycle rule."""
+
+    def __init__(self, s3_client, s3_uri: str):
+        bucket, _, prefix = s3_uri[len("s3://"):].partition("/")
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}.audio" if self.prefix else f"{key}.audio"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except Exception:
+            return None
+
+    def put(self, key: str, audio: bytes) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=audio)
+
+    def url(self, key: str, expires_in: int) -> str:
+        """Presigned GET URL, so players fetch the audio from S3 instead of the app process."""
+        return self.s3.generate_presigned_url("get_object", Params={"Bucket": self.bucket, "Key": self._key(key)},
+                                              ExpiresIn=expires_in)
+
+class TTSCache:
+    """Thread-safe LRU of Polly audio (bounded by bytes) in front of optional persistent tiers."""
+
+    def __init__(self, max_bytes: int = TTS_CACHE_MAX_BYTES, tiers=None):
+        self.max_bytes = max_bytes
+        self.tiers = list(tiers or [])
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = audio
+            self._size += len(audio)
+            while self._size > self.max_bytes and len(self._data) > 1:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._data.get(key)
+            if audio is not None:
+                self._data.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return audio
+        for tier in self.tiers:
+            audio = tier.get(key)
+            if audio is not None:
+                self._remember(key, audio)
+                self._count("persistent_hits")
+                return audio
+        self._count("misses")
+        return None
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """Like get, but not counted in stats and without reordering the LRU (history replay, not synthesis)."""
+        with self._lock:
+            audio = self._data.get(key)
+        if audio is not None:
+            return audio
+        for tier in self.tiers:
+            audio = tier.get(key)
+            if audio is not None:
+                return audio
+        return None
+
+    def put(self, key: str, audio: bytes) -> None:
+        self._remember(key, audio)
+        for tier in self.tiers:
+            try:
+                tier.put(key, audio)
+            except Exception as e:
+                print(f"TTS cache write failed ({type(tier).__name__}): {e}")
+
+    def audio_ref(self, key: str, expires_in: int = 3600):
+        """
+        Something st.audio can play for a cached chunk: a presigned URL when a
+        tier can produce one (no bytes held by the app), else the audio bytes,
+        or None when the chunk is no longer cached. Not counted in stats.
+        """
+        for tier in self.tiers:
+            url = getattr(tier, "url", None)
+            if url is not None:
+                try:
+                    return url(key, expires_in)
+                except Exception as e:
+                    print(f"TTS cache URL failed ({type(tier).__name__}): {e}")
+        return self.peek(key)
+
+    def answer_ref(self, keys: Sequence[str], expires_in: int = 3600):
+        """
+        One playable item for all chunks of an answer: audio_ref of a single
+        chunk, else the chunks' MP3 bytes joined in order. None when any chunk
+        is no longer cached. Not counted in stats.
+        """
+        if len(keys) == 1:
+            return self.audio_ref(keys[0], expires_in)
+        parts = [self.peek(key) for key in keys]
+        if not parts or any(audio is None for audio in parts):
+            return None
+        return b"".join(parts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["memory_bytes"] = self._size
+            out["memory_items"] = len(self._data)
+        lookups = out["memory_hits"] + out["persistent_hits"] + out["misses"]
+        out["hit_rate"] = round((lookups - out["misses"]) / lookups, 3) if lookups else 0.0
+        return out
+
+@st.cache_resource
+def get_tts_cache(_s3_client=None) -> TTSCache:
+    """Process-wide cache instance, reused across reruns and sessions."""
+    tiers = []
+    if TTS_CACHE_DIR:
+        tiers.append(_DiskTier(TTS_CACHE_DIR, TTS_CACHE_DIR_MAX_BYTES))
+    if TTS_CACHE_S3_URI and _s3_client is not None:
+        tiers.append(_S3Tier(_s3_client, TTS_CACHE_S3_URI))
+    return TTSCache(tiers=tiers)